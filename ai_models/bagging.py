@@ -0,0 +1,95 @@
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+def bootstrap_weights(num_samples, num_models, seed=None):
+    """
+    (num_models, num_samples) bootstrap multiplicities: row k counts how often
+    each sample was drawn (with replacement, num_samples draws) for member k.
+    Equivalent to Subset(dataset, np.random.choice(n, n, replace=True)).
+    """
+    rng = np.random.default_rng(seed)
+    counts = [
+        np.bincount(rng.choice(num_samples, size=num_samples, replace=True), minlength=num_samples)
+        for _ in range(num_models)
+    ]
+    return torch.tensor(np.stack(counts), dtype=torch.float32)
+
+def _epoch_loader(dataset, batch_size, collate_fn, generator):
+    # Fixed shuffled batches, so the sample indices of every batch are known
+    batches = [b.tolist() for b in torch.randperm(len(dataset), generator=generator).split(batch_size)]
+    loader = DataLoader(dataset, batch_sampler=batches, collate_fn=collate_fn)
+    return zip(batches, loader)
+
+def evaluate_members(members, loader, device):
+    """Accuracy of every member on `loader`, reading each batch once."""
+    for model in members:
+        model.eval()
+    correct = [0] * len(members)
+    total = 0
+    with torch.no_grad():
+        for images, labels in loader:
+            images, labels = images.to(device), labels.to(device)
+            for k, model in enumerate(members):
+                correct[k] += (model(images).argmax(1) == labels).sum().item()
+            total += labels.size(0)
+    return [c / total if total else 0.0 for c in correct]
+
+def train_members(members, optimizers, schedulers, dataset, val_loader, device, epochs,
+                  save_fn, batch_size=16, collate_fn=None, weights=None, seed=None, log_every=10):
+    """
+    Trains bagged ensemble members together over one pass of the data per epoch.
+
+    Each batch is loaded once and shown to every member; member k's loss is the
+    cross-entropy weighted by its bootstrap multiplicity of each sample (so a
+    sample drawn twice counts twice, one not drawn does not count), normalized by
+    the batch's total weight. This replaces building one bootstrap DataLoader per
+    member and cuts reading/decoding by roughly len(members)x.
+
+    After every epoch each member is validated (again reading val batches once),
+    its scheduler is stepped with its accuracy and save_fn(k, model, acc) is
+    called when it improves. Returns the best validation accuracy per member.
+    """
+    if weights is None:
+        weights = bootstrap_weights(len(dataset), len(members), seed)
+    generator = torch.Generator()
+    if seed is not None:
+        generator.manual_seed(seed)
+
+    best = [0.0] * len(members)
+    num_batches = (len(dataset) + batch_size - 1) // batch_size
+
+    for epoch in range(epochs):
+        for model in members:
+            model.train()
+        running_loss = [0.0] * len(members)
+
+        for i, (indices, (images, labels)) in enumerate(_epoch_loader(dataset, batch_size, collate_fn, generator)):
+            images, labels = images.to(device), labels.to(device)
+            batch_weights = weights[:, indices].to(device) # (M, B)
+
+            for k, (model, optimizer) in enumerate(zip(members, optimizers)):
+                w = batch_weights[k]
+                if w.sum() == 0:
+                    continue # None of these samples are in member k's bootstrap
+                optimizer.zero_grad()
+                losses = F.cross_entropy(model(images), labels, reduction='none')
+                loss = (losses * w).sum() / w.sum()
+                loss.backward()
+                optimizer.step()
+                running_loss[k] += loss.item()
+
+            if log_every and i % log_every == 0:
+                losses_str = ", ".join(f"{l / (i + 1):.4f}" for l in running_loss)
+                print(f"Epoch [{epoch+1}/{epochs}] Batch {i}/{num_batches} Avg loss per member: {losses_str}", flush=True)
+
+        val_accs = evaluate_members(members, val_loader, device)
+        for k, (model, scheduler, val_acc) in enumerate(zip(members, schedulers, val_accs)):
+            scheduler.step(val_acc)
+            print(f"Model {k+1} - Epoch [{epoch+1}/{epochs}] Loss: {running_loss[k] / num_batches:.4f} | Val Acc: {val_acc:.4f}", flush=True)
+            if val_acc > best[k]:
+                best[k] = val_acc
+                save_fn(k, model, val_acc)
+
+    return best
@@ -0,0 +1,74 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class MicroBatcher:
+    """
+    In-process dispatcher that coalesces concurrent single-item inference requests
+    into one batched call.
+
+    Callers submit one item and block until its own result is ready. A background
+    thread takes queued items and flushes them to `batch_fn` as soon as either
+    `max_batch_size` items are waiting or the oldest one has waited `max_wait_ms`,
+    which keeps the added latency bounded under low load.
+
+    `batch_fn` receives a list of items and must return a list of results in the
+    same order. If it raises, every caller in that batch gets the exception.
+    """
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5, name="micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """Queues one item and returns a Future for its result."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Submits one item and waits for its result."""
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        # Block for the first request, then gather more until the batch is full
+        # or the first one has waited long enough
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: expected {len(items)} results, got {len(results)}")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,16 @@
+import hashlib
+import os
+
+_hash_cache = {}
+
+def checkpoint_hash(path):
+    """SHA-256 of a checkpoint file (memoized per path, size and mtime)."""
+    stat = os.stat(path)
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hash_cache:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _hash_cache[key] = digest.hexdigest()
+    return _hash_cache[key]
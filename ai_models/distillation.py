@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from ai_models.bagging import _epoch_loader, evaluate_members
+
+def distillation_loss(logits, soft_targets, labels, temperature=2.0, alpha=0.7):
+    """
+    alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * CE(student, labels).
+
+    `soft_targets` are the teacher's (ensemble-averaged) probabilities at T=1;
+    they are re-tempered here so the student sees the same softening.
+    """
+    log_student = F.log_softmax(logits / temperature, dim=1)
+    teacher = F.softmax(torch.log(soft_targets.clamp_min(1e-8)) / temperature, dim=1)
+    soft_loss = F.kl_div(log_student, teacher, reduction='batchmean') * temperature ** 2
+    hard_loss = F.cross_entropy(logits, labels)
+    return alpha * soft_loss + (1 - alpha) * hard_loss
+
+def train_student(student, optimizer, scheduler, dataset, soft_targets, val_loader, device, epochs,
+                  save_fn, batch_size=16, collate_fn=None, temperature=2.0, alpha=0.7, seed=None, log_every=10):
+    """
+    Trains `student` against fixed per-sample teacher probabilities.
+
+    soft_targets[i] belongs to dataset[i]; the teacher is run once up front
+    (there is no augmentation, so its outputs never change between epochs).
+    Validation, scheduling and saving follow bagging.train_members: the
+    scheduler steps on val accuracy and save_fn(student, acc) is called on
+    improvement. Returns the best validation accuracy.
+    """
+    soft_targets = torch.as_tensor(soft_targets, dtype=torch.float32)
+    generator = torch.Generator()
+    if seed is not None:
+        generator.manual_seed(seed)
+
+    best = 0.0
+    num_batches = (len(dataset) + batch_size - 1) // batch_size
+
+    for epoch in range(epochs):
+        student.train()
+        running_loss = 0.0
+
+        for i, (indices, (images, labels)) in enumerate(_epoch_loader(dataset, batch_size, collate_fn, generator)):
+            images, labels = images.to(device), labels.to(device)
+            optimizer.zero_grad()
+            loss = distillation_loss(student(images), soft_targets[indices].to(device), labels, temperature, alpha)
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item()
+
+            if log_every and i % log_every == 0:
+                print(f"Epoch [{epoch+1}/{epochs}] Batch {i}/{num_batches} Loss: {loss.item():.4f}", flush=True)
+
+        val_acc = evaluate_members([student], val_loader, device)[0]
+        scheduler.step(val_acc)
+        print(f"Epoch [{epoch+1}/{epochs}] Loss: {running_loss / num_batches:.4f} | Val Acc: {val_acc:.4f}", flush=True)
+        if val_acc > best:
+            best = val_acc
+            save_fn(student, val_acc)
+
+    return best
+
+def agreement(student_probs, teacher_probs):
+    """Top-1 agreement and mean probability gap between student and teacher."""
+    student_probs, teacher_probs = np.asarray(student_probs), np.asarray(teacher_probs)
+    return {
+        "top1": float(np.mean(student_probs.argmax(axis=1) == teacher_probs.argmax(axis=1))),
+        # Half the L1 distance: 0 for identical distributions, 1 for disjoint ones
+        "total_variation": float(np.mean(np.abs(student_probs - teacher_probs).sum(axis=1) / 2)),
+    }
+
+def measure_latency(fn, example, repeats=20, warmup=3):
+    """Median wall time of fn(example) in milliseconds."""
+    synchronize = torch.cuda.synchronize if torch.cuda.is_available() else (lambda: None)
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + repeats):
+            synchronize()
+            start = time.perf_counter()
+            fn(example)
+            synchronize()
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def report(student_probs, teacher_probs, labels, student_ms, teacher_ms, batch_size):
+    """Prints accuracy, agreement with the teacher and the latency gain."""
+    match = agreement(student_probs, teacher_probs)
+    labels = np.asarray(labels)
+    print(f"Teacher accuracy: {np.mean(np.asarray(teacher_probs).argmax(axis=1) == labels):.4f}")
+    print(f"Student accuracy: {np.mean(np.asarray(student_probs).argmax(axis=1) == labels):.4f}")
+    print(f"Agreement with ensemble: {match['top1']:.2%} (mean total variation {match['total_variation']:.4f})")
+    print(f"Latency (batch of {batch_size}): ensemble {teacher_ms:.1f} ms | student {student_ms:.1f} ms "
+          f"| {teacher_ms / student_ms:.2f}x faster")
+    return match
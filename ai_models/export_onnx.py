@@ -0,0 +1,151 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+# Project root and the flat-import voice directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'ai_models', 'voice'))
+
+from ai_models.mri.bagging_inference import _candidate_model_paths
+from ai_models.mri.logits_store import REGISTERED_CHECKPOINTS, load_checkpoint_model
+from ai_models.onnx_backend import ONNX_THREADS, OnnxModel, check_parity, export, parity_and_benchmark, remove_export
+from model_registry import ARCH_NATIVE, create_architecture, load_checkpoint
+from native_model import N_MFCC, NATIVE_FRAMES
+
+VOICE_DIR = Path(project_root) / 'ai_models' / 'voice'
+DEFAULT_VOICE = [VOICE_DIR / 'best_model.pth', VOICE_DIR / 'best_native_model.pth'] + [VOICE_DIR / f'swin_{k}.pth' for k in (1, 2, 3)]
+DEFAULT_MRI = [Path(p) for p in _candidate_model_paths()] + list(REGISTERED_CHECKPOINTS.values())
+# Bare timm state_dict used by backend/inference/predict_voice.py
+DEFAULT_BACKEND_VOICE = Path(project_root) / 'backend' / 'models' / 'best_model.pth'
+
+def voice_model(path):
+    model_state, mean, std, classes, arch = load_checkpoint(path, 'cpu')
+    model = create_architecture(arch, len(classes))
+    model.load_state_dict(model_state)
+    return model, {
+        'classes': list(classes), 'mean': float(mean), 'std': float(std), 'num_classes': len(classes), 'arch': arch
+    }
+
+# Largest |eager - onnxruntime| logit difference an export may show
+PARITY_TOLERANCE = 1e-3
+
+def export_shape(meta):
+    """(input_shape, extra dynamic axes) of an export: native voice models also take any T."""
+    if meta.get('arch') == ARCH_NATIVE:
+        return (3, N_MFCC, NATIVE_FRAMES), {3: 'frames'}
+    return (3, 224, 224), None
+
+def extra_parity_shapes(meta):
+    """Input shapes besides the traced one that the parity check runs, one per extra dynamic axis size."""
+    if meta.get('arch') == ARCH_NATIVE:
+        return [(3, N_MFCC, 300), (3, N_MFCC, 160)]
+    return []
+
+def mri_model(path):
+    checkpoint = torch.load(path, map_location='cpu')
+    classes = checkpoint.get('classes') if isinstance(checkpoint, dict) else None
+    model = load_checkpoint_model(path, 'cpu')
+    return model, {'classes': list(classes) if classes else None, 'num_classes': model.num_classes}
+
+def timm_model(path, num_classes=2):
+    import timm
+
+    model = timm.create_model("swin_tiny_patch4_window7_224", pretrained=False, num_classes=num_classes)
+    model.load_state_dict(torch.load(path, map_location='cpu'))
+    return model, {'num_classes': num_classes}
+
+def import_seconds(statement):
+    """Wall time of a fresh interpreter running `statement` (import footprint)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', statement], capture_output=True)
+    if result.returncode != 0:
+        return None
+    return time.perf_counter() - start
+
+def report_parity(parity):
+    """Prints the parity results; True when every check is within PARITY_TOLERANCE with full agreement."""
+    ok = True
+    for r in parity:
+        label = f"batch {r['batch_size']:>3} x {r['input_shape']}"
+        if r['error']:
+            print(f"❌ {label}: onnxruntime failed: {r['error']}")
+            ok = False
+            continue
+        passed = r['max_abs_diff'] <= PARITY_TOLERANCE and r['agreement'] == 1.0
+        ok = ok and passed
+        print(f"{'✔' if passed else '❌'} {label}: max |diff| {r['max_abs_diff']:.2e} | agreement {r['agreement']:.2%}")
+    return ok
+
+def report_speedup(timings):
+    """States which batch sizes onnxruntime actually serves faster on this host (it is not faster everywhere)."""
+    faster = [b for b, r in timings.items() if r['onnx_ms'] < r['torch_ms']]
+    slower = [b for b in timings if b not in faster]
+    if not slower:
+        print("onnxruntime is faster than eager torch at every measured batch size.")
+    elif not faster:
+        print("onnxruntime is NOT faster than eager torch here at any measured batch size; keep INFERENCE_BACKEND=torch.")
+    else:
+        print(f"onnxruntime is faster at batch sizes {faster} but slower at {slower}; "
+              f"use INFERENCE_BACKEND=onnx only if serving batches look like the former.")
+
+def export_all(jobs, benchmark=True):
+    for kind, path, build in jobs:
+        if not path.exists():
+            continue
+        print(f"\n--- {kind}: {path} ---", flush=True)
+        model, meta = build(path)
+        model.eval()
+        input_shape, dynamic_axes = export_shape(meta)
+        onnx_path = export(model, path, meta, input_shape=input_shape, dynamic_input_axes=dynamic_axes)
+        # Same thread count as eager torch, so the timings compare like with like
+        onnx_model = OnnxModel(onnx_path, num_threads=ONNX_THREADS or torch.get_num_threads())
+        extra_shapes = extra_parity_shapes(meta)
+
+        if benchmark:
+            parity, timings = parity_and_benchmark(model, onnx_model, input_shape=input_shape, extra_input_shapes=extra_shapes)
+        else:
+            parity, timings = check_parity(model, onnx_model, [input_shape, *extra_shapes]), {}
+        if not report_parity(parity):
+            # A broken export must not be served: loaders fall back to eager torch without one
+            remove_export(path)
+            print(f"❌ Parity check failed; removed the export of {path}.")
+            continue
+
+        for batch_size, r in timings.items():
+            print(f"batch {batch_size:>3}: torch {r['torch_ms']:.1f} ms | onnxruntime {r['onnx_ms']:.1f} ms "
+                  f"({r['torch_ms'] / r['onnx_ms']:.2f}x)")
+        if timings:
+            report_speedup(timings)
+
+    if benchmark:
+        print("\n--- Import footprint (fresh interpreter) ---")
+        eager = import_seconds("import torch, timm")
+        runtime = import_seconds("import numpy, onnxruntime")
+        print(f"torch + timm: {eager:.2f}s" if eager is not None else "torch + timm: not installed")
+        print(f"onnxruntime:  {runtime:.2f}s" if runtime is not None else "onnxruntime:  not installed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the voice and MRI Swin checkpoints to ONNX")
+    parser.add_argument('--voice', nargs='*', help="voice checkpoints (default: best_model.pth and the bags)")
+    parser.add_argument('--mri', nargs='*', help="MRI checkpoints (default: inference candidates and registered ones)")
+    parser.add_argument('--backend-voice', nargs='*', help="bare timm state_dicts with 2 classes (backend/models)")
+    parser.add_argument('--no-benchmark', action='store_true', help="skip the timings (parity is always checked)")
+    args = parser.parse_args()
+
+    explicit = args.voice is not None or args.mri is not None or args.backend_voice is not None
+    voice = [Path(p) for p in args.voice] if args.voice else ([] if explicit else DEFAULT_VOICE)
+    mri = [Path(p) for p in args.mri] if args.mri else ([] if explicit else DEFAULT_MRI)
+    backend_voice = [Path(p) for p in args.backend_voice] if args.backend_voice else ([] if explicit else [DEFAULT_BACKEND_VOICE])
+
+    jobs = (
+        [('voice', p, voice_model) for p in voice]
+        + [('mri', p, mri_model) for p in dict.fromkeys(mri)]
+        + [('backend voice', p, timm_model) for p in backend_voice]
+    )
+    export_all(jobs, benchmark=not args.no_benchmark)
@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Project root and the flat-import voice directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+sys.path.append(os.path.join(project_root, 'ai_models', 'voice'))
+
+import torch
+
+from ai_models.export_onnx import (
+    DEFAULT_BACKEND_VOICE, DEFAULT_MRI, DEFAULT_VOICE, export_shape, mri_model, timm_model, voice_model
+)
+from ai_models.model_factory import create_swin
+from ai_models.mri.model import get_model
+from ai_models.shared_weights import build_shared, load_flat, save_flat
+from model_registry import ARCH_SWIN, create_architecture
+
+# The factories the loaders pass to build_shared, per checkpoint kind
+FACTORIES = {
+    'voice': lambda meta: create_architecture(meta.get('arch', ARCH_SWIN), meta['num_classes']),
+    'mri': lambda meta: get_model(num_classes=meta['num_classes'], pretrained=False),
+    'backend voice': lambda meta: create_swin(meta['num_classes']),
+}
+
+def check_parity(model, shared, input_shape, batch_size=2, seed=0):
+    """Max |difference| between the eager and shared-weight models' logits on random inputs."""
+    x = torch.randn(batch_size, *input_shape, generator=torch.Generator().manual_seed(seed))
+    with torch.no_grad():
+        return float((model(x) - shared(x)).abs().max())
+
+def convert(jobs, verify=True):
+    """
+    Writes `<checkpoint>.weights` for every existing checkpoint, then checks the
+    round trip tensor by tensor and runs a forward pass through the model the
+    loaders would build (catches buffers the weight file does not carry).
+    """
+    for kind, path, build in jobs:
+        if not path.exists():
+            continue
+        print(f"\n--- {kind}: {path} ---", flush=True)
+        model, meta = build(path)
+        model.eval()
+        state_dict = model.state_dict()
+        save_flat(state_dict, path, meta)
+        if not verify:
+            continue
+
+        shared, _ = load_flat(path)
+        mismatched = [name for name, t in state_dict.items() if name not in shared or not shared[name].equal(t)]
+        print("✔ Memory-mapped weights match the checkpoint." if not mismatched else f"❌ Mismatched tensors: {mismatched}")
+
+        shared_model, _ = build_shared(FACTORIES[kind], path)
+        input_shape, _ = export_shape(meta)
+        diff = check_parity(model.cpu(), shared_model, input_shape)
+        print(f"{'✔' if diff <= 1e-5 else '❌'} Forward pass parity: max |diff| {diff:.2e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write memory-mappable weight files for the inference checkpoints")
+    parser.add_argument('--voice', nargs='*', help="voice checkpoints (default: best_model.pth and the bags)")
+    parser.add_argument('--mri', nargs='*', help="MRI checkpoints (default: inference candidates and registered ones)")
+    parser.add_argument('--backend-voice', nargs='*', help="bare timm state_dicts with 2 classes (backend/models)")
+    parser.add_argument('--no-verify', action='store_true', help="skip the round-trip comparison")
+    args = parser.parse_args()
+
+    explicit = args.voice is not None or args.mri is not None or args.backend_voice is not None
+    voice = [Path(p) for p in args.voice] if args.voice else ([] if explicit else DEFAULT_VOICE)
+    mri = [Path(p) for p in args.mri] if args.mri else ([] if explicit else DEFAULT_MRI)
+    backend_voice = [Path(p) for p in args.backend_voice] if args.backend_voice else ([] if explicit else [DEFAULT_BACKEND_VOICE])
+
+    jobs = (
+        [('voice', p, voice_model) for p in voice]
+        + [('mri', p, mri_model) for p in dict.fromkeys(mri)]
+        + [('backend voice', p, timm_model) for p in backend_voice]
+    )
+    convert(jobs, verify=not args.no_verify)
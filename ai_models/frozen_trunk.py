@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Dataset
+
+# Opt-in training mode: run the frozen patch embedding + stages 0-1 once per
+# sample and train only the tail on the cached activations. Off by default: the
+# cache is written to disk (several GB for a full split) and the eval-mode trunk
+# drops stochastic depth in the frozen stages, so the numerics differ slightly
+# from end-to-end training (see ActivationCache)
+CACHE_FROZEN_TRUNK = os.environ.get("CACHE_FROZEN_TRUNK", "0") == "1"
+
+# Stages that stay trainable in both Swin models (see voice/swin_model.py, mri/model.py);
+# everything before them is frozen and, without augmentation, gives the same output every epoch
+FIRST_TRAINABLE_STAGE = 2
+
+def unwrap_swin(model):
+    """Returns the timm Swin inside the voice SwinTransformer wrapper (or the model itself)."""
+    return getattr(model, 'model', model)
+
+def trunk_forward(model, x):
+    """Patch embedding + stages 0-1: the frozen part of the network."""
+    swin = unwrap_swin(model)
+    x = swin.patch_embed(x)
+    if getattr(swin, 'absolute_pos_embed', None) is not None:
+        x = x + swin.absolute_pos_embed
+    if hasattr(swin, 'pos_drop'):
+        x = swin.pos_drop(x)
+    for layer in swin.layers[:FIRST_TRAINABLE_STAGE]:
+        x = layer(x)
+    return x
+
+def tail_forward(model, x):
+    """Stages 2-3, final norm and head, applied to trunk activations."""
+    swin = unwrap_swin(model)
+    for layer in swin.layers[FIRST_TRAINABLE_STAGE:]:
+        x = layer(x)
+    x = swin.norm(x)
+    return swin.forward_head(x)
+
+class TailModel(nn.Module):
+    """
+    Trains `model` on cached trunk activations: forward() runs only the tail.
+    The wrapped model's parameters (and state_dict) are shared, so checkpoints
+    saved from `model` are the usual full-network checkpoints.
+    """
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        return tail_forward(self.model, x)
+
+def _trunk_hash(model):
+    digest = hashlib.sha256()
+    swin = unwrap_swin(model)
+    modules = [swin.patch_embed] + list(swin.layers[:FIRST_TRAINABLE_STAGE])
+    for module in modules:
+        for name, tensor in module.state_dict().items():
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+class ActivationCache(Dataset):
+    """
+    Memory-mapped store of frozen-trunk activations for one dataset split.
+
+    build() runs the trunk once per sample (in eval mode, no grad) over a
+    non-shuffled loader and writes the outputs to `<cache_dir>/activations.npy`
+    with the labels alongside. The cache is reused as long as `data_key`
+    (describing the inputs, e.g. a file fingerprint plus normalization) and the
+    trunk weights are unchanged. Items are (activation, label) pairs, so the
+    cache can be fed straight to a DataLoader for TailModel training.
+
+    The trunk runs in eval mode, so the tail trains on deterministic
+    activations: stochastic depth in the frozen stages (timm's Swin defaults to
+    drop_path_rate=0.1) is off, unlike end-to-end training where those stages
+    still drop paths in train mode. Activations are stored as float32 by
+    default; dtype=np.float16 halves the cache at the cost of rounding the
+    tail's inputs.
+    """
+    def __init__(self, cache_dir, dtype=np.float32):
+        self.cache_dir = Path(cache_dir)
+        self.dtype = np.dtype(dtype)
+        self.activations = None
+        self.labels = None
+
+    def _key(self, model, data_key):
+        return hashlib.sha256(f"{data_key}|{_trunk_hash(model)}|{self.dtype.str}".encode()).hexdigest()
+
+    def load(self, model, data_key):
+        """Opens the cache if it matches; returns False when it has to be (re)built."""
+        index_path = self.cache_dir / "index.json"
+        if not index_path.exists() or not (self.cache_dir / "activations.npy").exists():
+            return False
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("key") != self._key(model, data_key):
+            return False
+        self.activations = np.load(self.cache_dir / "activations.npy", mmap_mode='r')
+        self.labels = index["labels"]
+        return True
+
+    def build(self, model, loader, data_key, device):
+        """Runs the trunk over `loader` (must not shuffle) unless a matching cache exists."""
+        if self.load(model, data_key):
+            print(f"Using cached trunk activations from {self.cache_dir}", flush=True)
+            return self
+
+        print(f"Caching frozen trunk activations in {self.cache_dir} "
+              f"({self.dtype.name}, eval-mode trunk: no stochastic depth in stages 0-{FIRST_TRAINABLE_STAGE - 1})...", flush=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_dir / "activations.npy.tmp"
+
+        was_training = model.training
+        model.eval()
+        store = None
+        labels = []
+        offset = 0
+        total = len(loader.dataset)
+        with torch.no_grad():
+            for images, batch_labels in loader:
+                acts = trunk_forward(model, images.to(device)).cpu().numpy()
+                if store is None:
+                    store = np.lib.format.open_memmap(
+                        tmp_path, mode='w+', dtype=self.dtype, shape=(total,) + acts.shape[1:]
+                    )
+                store[offset:offset + len(acts)] = acts
+                offset += len(acts)
+                labels.extend(int(label) for label in batch_labels)
+        model.train(was_training)
+
+        if store is None:
+            raise ValueError("Cannot cache activations of an empty dataset.")
+        store.flush()
+        del store
+        os.replace(tmp_path, self.cache_dir / "activations.npy")
+        with open(self.cache_dir / "index.json", "w") as f:
+            json.dump({"key": self._key(model, data_key), "labels": labels}, f)
+
+        self.activations = np.load(self.cache_dir / "activations.npy", mmap_mode='r')
+        self.labels = labels
+        return self
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        return torch.from_numpy(np.array(self.activations[idx], dtype=np.float32)), self.labels[idx]
+
+def activation_loader(model, loader, cache_dir, data_key, device, shuffle=False, dtype=np.float32):
+    """
+    Caches the trunk activations of `loader`'s dataset (read in order, once) and
+    returns a DataLoader over them with the same batch size.
+    """
+    ordered = DataLoader(loader.dataset, batch_size=loader.batch_size, shuffle=False, collate_fn=loader.collate_fn)
+    cache = ActivationCache(cache_dir, dtype=dtype).build(model, ordered, data_key, device)
+    return DataLoader(cache, batch_size=loader.batch_size, shuffle=shuffle)
@@ -0,0 +1,74 @@
+import argparse
+import os
+from pathlib import Path
+
+SWIN_ARCH = "swin_tiny_patch4_window7_224"
+# Local backbone weight cache; training reads ImageNet weights from here
+WEIGHTS_DIR = Path(os.environ.get("MODEL_WEIGHTS_DIR", Path(__file__).resolve().parent / "weights"))
+# Downloads are opt-in: without this, missing weights fail fast instead of blocking on the hub
+ALLOW_DOWNLOAD = os.environ.get("MODEL_ALLOW_DOWNLOAD", "0") == "1"
+DOWNLOAD_TIMEOUT = os.environ.get("MODEL_DOWNLOAD_TIMEOUT", "30") # seconds, per hub request
+
+class PretrainedWeightsMissing(FileNotFoundError):
+    pass
+
+def weights_path(arch=SWIN_ARCH):
+    return WEIGHTS_DIR / f"{arch}.pth"
+
+def fetch_pretrained(arch=SWIN_ARCH):
+    """
+    Downloads the timm ImageNet weights of `arch` once and stores them in the
+    local cache. The only function here that touches the network.
+    """
+    import timm
+    import torch
+
+    os.environ.setdefault("HF_HUB_DOWNLOAD_TIMEOUT", DOWNLOAD_TIMEOUT)
+    path = weights_path(arch)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Downloading pretrained {arch} weights...", flush=True)
+    model = timm.create_model(arch, pretrained=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    print(f"Saved {path}", flush=True)
+    return path
+
+def create_swin(num_classes, pretrained=False, arch=SWIN_ARCH):
+    """
+    Builds the Swin architecture used by both the voice and MRI models.
+
+    pretrained=False (every path that loads a checkpoint afterwards) never
+    touches the network. pretrained=True (training) initializes the backbone
+    from the local weight cache; timm drops the 1000-class head and creates a
+    new `num_classes` one. If the cache is empty this raises
+    PretrainedWeightsMissing right away, unless MODEL_ALLOW_DOWNLOAD=1, in
+    which case the weights are fetched once (with a hub timeout) and cached.
+    """
+    import timm
+
+    if not pretrained:
+        return timm.create_model(arch, pretrained=False, num_classes=num_classes)
+
+    path = weights_path(arch)
+    if not path.exists():
+        if not ALLOW_DOWNLOAD:
+            raise PretrainedWeightsMissing(
+                f"Pretrained {arch} weights not found at {path}. Run `python ai_models/model_factory.py --fetch` "
+                f"where the network is available (or set MODEL_WEIGHTS_DIR / MODEL_ALLOW_DOWNLOAD=1)."
+            )
+        fetch_pretrained(arch)
+
+    return timm.create_model(
+        arch, pretrained=True, num_classes=num_classes, pretrained_cfg_overlay=dict(file=str(path))
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local pretrained weight cache")
+    parser.add_argument('--fetch', action='store_true', help="download the backbone weights into the cache")
+    args = parser.parse_args()
+
+    path = weights_path()
+    if args.fetch:
+        fetch_pretrained()
+    print(f"{path}: {'present' if path.exists() else 'missing'}")
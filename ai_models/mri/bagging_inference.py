@@ -2,73 +2,194 @@ import torch
 import torch.nn.functional as F
 import os
 import sys
-import numpy as np
+import threading
 from PIL import Image
 
 # Add project root to sys.path
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
+from ai_models.batching import MicroBatcher
 from ai_models.mri.model import get_model
 from ai_models.mri.dataset import transform
+from ai_models.onnx_backend import load_onnx, use_onnx
+from ai_models.quantization import maybe_quantize
+from ai_models.shared_weights import build_shared, use_shared_weights
 
 def load_model_mri(model_path, device):
+    if use_onnx():
+        # INFERENCE_BACKEND=onnx: run the exported graph (falls back to torch without one)
+        model, meta = load_onnx(model_path)
+        if model is not None:
+            return model, meta['classes']
+
+    if use_shared_weights(device):
+        # SHARED_WEIGHTS=1: weights are views of a memory map shared by all workers
+        model, meta = build_shared(lambda meta: get_model(num_classes=meta['num_classes'], pretrained=False), model_path)
+        if model is not None:
+            model, _ = maybe_quantize(model, model_path, device)
+            return model, meta['classes']
+
     checkpoint = torch.load(model_path, map_location=device)
     num_classes = checkpoint.get('num_classes', 4)
-    model = get_model(num_classes=num_classes).to(device)
+    # Weights come from the checkpoint, so skip the pretrained timm download
+    model = get_model(num_classes=num_classes, pretrained=False).to(device)
     model.load_state_dict(checkpoint['model_state_dict'])
     model.eval()
+    # INT8 Linear layers when QUANTIZE_INFERENCE=1 and the checkpoint passed the gate
+    model, _ = maybe_quantize(model, model_path, device)
     return model, checkpoint['classes']
 
-def predict_mri_ensemble(image_path):
-    """
-    Ensemble inference for MRI using 3 bagged Swin Transformer models.
-    Returns: final_class_name, confidence_score
-    """
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+def _candidate_model_paths():
     model_dir = os.path.dirname(os.path.abspath(__file__))
-    model_paths = [
+    return [
         os.path.join(model_dir, 'swin_mri_1.pth'),
         os.path.join(project_root, 'best_model.pth'),  # Fallback to root model
         os.path.join(model_dir, 'swin_mri_v1.pth'),  # Possible alternative name
     ]
 
+def preprocess_mri(image_path):
+    """
+    Loads an MRI image and returns the normalized (3, 224, 224) tensor shared by all members.
+    """
+    img = Image.open(image_path).convert('RGB')
+    return transform(img)
+
+class MRIEnsemble:
+    """
+    Long-lived MRI bagging ensemble.
+
+    Candidate checkpoints are resolved and loaded once (on load() or the first
+    prediction); afterwards every request is just one forward pass per active
+    member over the shared preprocessed batch. Members whose class list differs
+    from the first one are skipped, since their probabilities cannot be averaged.
+    """
+    def __init__(self, model_paths=None, device=None):
+        self.model_paths = model_paths or _candidate_model_paths()
+        # ONNX Runtime runs on the CPU provider, so keep every member there
+        default = 'cuda' if torch.cuda.is_available() and not use_onnx() else 'cpu'
+        self.device = device or torch.device(default)
+        self.members = []
+        self.classes = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Loads every available member. Safe to call repeatedly."""
+        with self._lock:
+            if self._loaded:
+                return self
+
+            for m_path in self.model_paths:
+                if not os.path.exists(m_path):
+                    print(f"Warning: MRI Model {m_path} not found. Skipping.")
+                    continue
+                try:
+                    model, classes = load_model_mri(m_path, self.device)
+                except Exception as e:
+                    print(f"Warning: could not load MRI Model {m_path}: {e}")
+                    continue
+
+                if self.classes is None:
+                    self.classes = list(classes)
+                elif list(classes) != self.classes:
+                    print(f"Warning: MRI Model {m_path} has classes {classes}, expected {self.classes}. Skipping.")
+                    continue
+                self.members.append((m_path, model))
+
+            if not self.members:
+                print("Error: No MRI models available for inference.")
+            else:
+                print(f"MRI ensemble ready with {len(self.members)} member(s): {self.active_members()}")
+            self._loaded = True
+            return self
+
+    def reload(self):
+        """Drops the loaded members and resolves the candidate paths again."""
+        with self._lock:
+            self.members = []
+            self.classes = None
+            self._loaded = False
+        return self.load()
+
+    def active_members(self):
+        return [m_path for m_path, _ in self.members]
+
+    def predict(self, img_tensors):
+        """
+        Ensemble inference over a list of preprocessed (3, 224, 224) tensors.
+        Returns: list of (final_class_name, confidence_score), one per input
+        """
+        self.load()
+        if not self.members:
+            return [("Unknown", 0.0)] * len(img_tensors)
+
+        batch = torch.stack(img_tensors).to(self.device)
+        with torch.no_grad():
+            # Average probabilities across the ensemble
+            avg_probs = sum(F.softmax(model(batch), dim=1) for _, model in self.members) / len(self.members)
+            confidence, final_class_idx = avg_probs.max(dim=1)
+
+        return [
+            (self.classes[idx], conf)
+            for idx, conf in zip(final_class_idx.tolist(), confidence.tolist())
+        ]
+
+# Shared by every caller in the process
+ensemble = MRIEnsemble()
+
+def warm_up():
+    """
+    Loads the MRI ensemble ahead of the first request. Returns the active member paths.
+    """
+    return ensemble.load().active_members()
+
+def predict_mri_batch(img_tensors):
+    """
+    Ensemble inference over a list of preprocessed (3, 224, 224) tensors in one
+    batched forward per member.
+    Returns: list of (final_class_name, confidence_score), one per input
+    """
+    return ensemble.predict(img_tensors)
+
+def predict_mri_ensemble(image_path):
+    """
+    Ensemble inference for MRI using the resident bagged Swin Transformer models.
+    Returns: final_class_name, confidence_score
+    """
     # Preprocess image
     try:
-        img = Image.open(image_path).convert('RGB')
-        img_tensor = transform(img).unsqueeze(0).to(device)
+        img_tensor = preprocess_mri(image_path)
     except Exception as e:
         print(f"Error opening image: {e}")
         return None, 0.0
 
-    all_probs = []
-    classes = None
-
-    with torch.no_grad():
-        for m_path in model_paths:
-            if not os.path.exists(m_path):
-                print(f"Warning: MRI Model {m_path} not found. Skipping.")
-                continue
-            
-            model, current_classes = load_model_mri(m_path, device)
-            classes = current_classes # Assuming classes are identical across models
-            
-            logits = model(img_tensor)
-            probs = F.softmax(logits, dim=1)
-            all_probs.append(probs.cpu().numpy())
-
-    if not all_probs:
-        print("Error: No MRI models available for inference.")
-        return "Unknown", 0.0
+    return predict_mri_batch([img_tensor])[0]
 
-    # Average probabilities across the ensemble
-    avg_probs = np.mean(all_probs, axis=0)
-    final_class_idx = np.argmax(avg_probs, axis=1)[0]
-    
-    final_class_name = classes[final_class_idx]
-    confidence = avg_probs[0][final_class_idx]
+# Coalesces concurrent uploads into one batched ensemble pass
+_dispatcher = MicroBatcher(
+    predict_mri_batch,
+    max_batch_size=int(os.environ.get("MRI_DISPATCH_MAX_BATCH", 8)),
+    max_wait_ms=float(os.environ.get("MRI_DISPATCH_MAX_WAIT_MS", 5)),
+    name="mri-dispatcher",
+)
 
-    return final_class_name, float(confidence)
+def predict_mri_ensemble_batched(image_path):
+    """
+    Same contract as predict_mri_ensemble(), but the forward passes are shared
+    with other concurrent callers through the micro-batching dispatcher.
+    """
+    try:
+        img_tensor = preprocess_mri(image_path)
+    except Exception as e:
+        print(f"Error opening image: {e}")
+        return None, 0.0
+
+    try:
+        return _dispatcher(img_tensor)
+    except Exception as e:
+        print(f"MRI inference failed: {e}")
+        return "Unknown", 0.0
 
 if __name__ == "__main__":
     # Example usage
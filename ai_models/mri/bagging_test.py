@@ -1,9 +1,6 @@
 import torch
-import torch.nn.functional as F
 import os
 import sys
-from torchvision.datasets import ImageFolder
-from torch.utils.data import DataLoader
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import numpy as np
 
@@ -11,41 +8,19 @@ import numpy as np
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
-from ai_models.mri.model import get_model
-from ai_models.mri.dataset import transform
-
-def load_model_mri(model_path, device):
-    checkpoint = torch.load(model_path, map_location=device)
-    num_classes = checkpoint.get('num_classes', 4)
-    model = get_model(num_classes=num_classes).to(device)
-    model.load_state_dict(checkpoint['model_state_dict'])
-    model.eval()
-    return model
+from ai_models.mri.logits_store import LogitsStore, REGISTERED_CHECKPOINTS, ensemble_probs, registered_checkpoints
 
 def evaluate_bagging():
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
 
-    model_dir = os.path.dirname(os.path.abspath(__file__))
-    model_paths = [
-        os.path.join(model_dir, 'swin_bag1.pth'),
-        os.path.join(model_dir, 'swin_bag2.pth'),
-        os.path.join(model_dir, 'swin_bag3.pth'),
-        os.path.join(model_dir, 'swin_boosted.pth')
-    ]
-
-    # Load models
-    models = []
-    checkpoint_classes = None
-    for path in model_paths:
-        if os.path.exists(path):
-            models.append(load_model_mri(path, device))
-            if checkpoint_classes is None:
-                checkpoint_classes = torch.load(path, map_location=device).get('classes')
-        else:
-            print(f"Warning: Model {path} not found.")
+    # Load models (each one is run over the split at most once; see logits_store.py)
+    checkpoints = registered_checkpoints(['bag1', 'bag2', 'bag3', 'boosted'])
+    for name in ['bag1', 'bag2', 'bag3', 'boosted']:
+        if name not in checkpoints:
+            print(f"Warning: Model {REGISTERED_CHECKPOINTS[name]} not found.")
 
-    if not models:
+    if not checkpoints:
         print("❌ Error: No models found for evaluation.")
         return
 
@@ -55,41 +30,18 @@ def evaluate_bagging():
         print(f"❌ Error: Test directory {test_dir} not found.")
         return
 
-    test_dataset = ImageFolder(test_dir, transform=transform)
-    test_loader = DataLoader(test_dataset, batch_size=16, shuffle=False)
-    
-    classes = test_dataset.classes
+    results = LogitsStore(device=device).evaluate(checkpoints, test_dir)
+    first = next(iter(results.values()))
+    classes = first.classes
+    all_labels = first.labels
     print(f"Evaluating on classes: {classes}")
+    print(f"Processing {len(all_labels)} images...")
 
-    all_labels = []
-    all_ensemble_preds = []
-    
-    # Store individual model accuracies for comparison
-    individual_preds = [[] for _ in range(len(models))]
-
-    print(f"Processing {len(test_dataset)} images...")
-
-    with torch.no_grad():
-        for images, labels in test_loader:
-            images, labels = images.to(device), labels.to(device)
-            
-            # Get predictions for each model
-            batch_probs = []
-            for i, model in enumerate(models):
-                logits = model(images)
-                probs = F.softmax(logits, dim=1)
-                batch_probs.append(probs)
-                
-                # For individual accuracy
-                _, s_preds = torch.max(probs, 1)
-                individual_preds[i].extend(s_preds.cpu().numpy())
+    # Individual predictions for comparison
+    individual_preds = [r.preds for r in results.values()]
 
-            # Average probabilities
-            avg_probs = torch.mean(torch.stack(batch_probs), dim=0)
-            _, ensemble_preds = torch.max(avg_probs, 1)
-            
-            all_ensemble_preds.extend(ensemble_preds.cpu().numpy())
-            all_labels.extend(labels.cpu().numpy())
+    # Average probabilities
+    all_ensemble_preds = np.argmax(ensemble_probs(results.values()), axis=1)
 
     # Calculate Accuracies
     print("\n--- RESULTS ---")
@@ -4,7 +4,6 @@ from torch.optim import AdamW
 import numpy as np
 import os
 import sys
-from torchvision import datasets
 from torch.utils.data import DataLoader, WeightedRandomSampler
 
 # Add project root to sys.path
@@ -12,7 +11,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.append(project_root)
 
 from ai_models.mri.model import get_model
-from ai_models.mri.dataset import transform
+from ai_models.mri.dataset import CachedImageFolder
 
 def train_boosted_model():
     device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -31,7 +30,7 @@ def train_boosted_model():
         print(f"❌ Error: Dataset path {dataset_path} not found.")
         return
 
-    dataset = datasets.ImageFolder(dataset_path, transform=transform)
+    dataset = CachedImageFolder(dataset_path)
     classes = dataset.classes
     num_classes = len(classes)
 
@@ -1,67 +1,43 @@
 import torch
-import torch.nn.functional as F
 import os
 import sys
 import seaborn as sns
 import matplotlib.pyplot as plt
 from sklearn.metrics import confusion_matrix, classification_report
-from torchvision import datasets
-from torch.utils.data import DataLoader
 
 # Add project root to sys.path
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
-from ai_models.mri.model import get_model
-from ai_models.mri.dataset import transform
+from ai_models.mri.logits_store import LogitsStore, REGISTERED_CHECKPOINTS
 
 def generate_confusion_matrix():
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Using device: {device}")
 
     # Use the boosted model as it represents the highest complexity
-    model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "swin_boosted.pth")
+    model_path = REGISTERED_CHECKPOINTS['boosted']
     if not os.path.exists(model_path):
         print(f"⚠️ Warning: {model_path} not found. Trying best_mri_swin.pth")
-        model_path = os.path.join(project_root, "best_mri_swin.pth")
+        model_path = REGISTERED_CHECKPOINTS['best']
 
     if not os.path.exists(model_path):
         print(f"❌ Error: Model file not found. Please train a model first.")
         return
 
-    checkpoint = torch.load(model_path, map_location=device)
-    num_classes = checkpoint.get('num_classes', 4)
-    model = get_model(num_classes=num_classes).to(device)
-    
-    # Check if checkpoint is a state_dict or a dict containing state_dict
-    if 'model_state_dict' in checkpoint:
-        model.load_state_dict(checkpoint['model_state_dict'])
-    else:
-        model.load_state_dict(checkpoint)
-        
-    model.eval()
-
     test_dir = os.path.join(project_root, "datasets", "MRI_CROPPED", "test")
     if not os.path.exists(test_dir):
         print(f"❌ Error: Test dataset {test_dir} not found.")
         return
 
-    test_dataset = datasets.ImageFolder(test_dir, transform=transform)
-    test_loader = DataLoader(test_dataset, batch_size=16, shuffle=False)
-    
-    classes = test_dataset.classes
-    print(f"Generating confusion matrix for classes: {classes}")
+    # Logits are computed once per checkpoint + split and reused afterwards
+    result = LogitsStore(device=device).get(model_path, test_dir)
 
-    all_preds = []
-    all_labels = []
+    classes = result.classes
+    print(f"Generating confusion matrix for classes: {classes}")
 
-    with torch.no_grad():
-        for images, labels in test_loader:
-            images = images.to(device)
-            outputs = model(images)
-            _, preds = torch.max(outputs, 1)
-            all_preds.extend(preds.cpu().numpy())
-            all_labels.extend(labels.numpy())
+    all_preds = result.preds
+    all_labels = result.labels
 
     cm = confusion_matrix(all_labels, all_preds)
 
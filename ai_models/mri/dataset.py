@@ -1,17 +1,120 @@
+import hashlib
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
 from torchvision import transforms
 from torchvision.datasets import ImageFolder
-from torch.utils.data import DataLoader
+from torch.utils.data import DataLoader, Dataset
+
+IMG_SIZE = 224
+CACHE_SUFFIX = ".cache"
+CACHE_IMAGES = "images.npy"
+CACHE_INDEX = "index.json"
+
+resize = transforms.Resize((IMG_SIZE, IMG_SIZE))
+normalize = transforms.Normalize(
+    mean=[0.5, 0.5, 0.5],
+    std=[0.5, 0.5, 0.5]
+)
 
 transform = transforms.Compose([
-    transforms.Resize((224, 224)),
+    resize,
     transforms.ToTensor(),
-    transforms.Normalize(
-        mean=[0.5, 0.5, 0.5],
-        std=[0.5, 0.5, 0.5]
-    )
+    normalize
 ])
 
+def cache_dir_for(root):
+    """Decoded-image cache of an ImageFolder root, e.g. MRI_CROPPED/train -> MRI_CROPPED/train.cache"""
+    root = Path(root)
+    return root.parent / (root.name + CACHE_SUFFIX)
+
+def _fingerprint(root, samples):
+    # Any added, removed, renamed or rewritten image changes the fingerprint
+    digest = hashlib.sha256()
+    for path, label in samples:
+        stat = os.stat(path)
+        rel = Path(path).relative_to(root).as_posix()
+        digest.update(f"{rel}|{label}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+def _decode(path):
+    # Same decode + resize as `transform`, stopped before ToTensor
+    img = Image.open(path).convert('RGB')
+    return np.asarray(resize(img), dtype=np.uint8)
+
+def build_image_cache(root, samples, classes, fingerprint, num_workers=None):
+    """Decodes every image of `root` once into a (N, 224, 224, 3) uint8 memmap."""
+    cache_dir = cache_dir_for(root)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Building image cache for {root} ({len(samples)} images)...", flush=True)
+
+    tmp_images = cache_dir / (CACHE_IMAGES + ".tmp")
+    images = np.lib.format.open_memmap(
+        tmp_images, mode='w+', dtype=np.uint8, shape=(len(samples), IMG_SIZE, IMG_SIZE, 3)
+    )
+    workers = num_workers or min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, img in enumerate(pool.map(_decode, [path for path, _ in samples])):
+            images[i] = img
+    images.flush()
+    del images
+    os.replace(tmp_images, cache_dir / CACHE_IMAGES)
+
+    index = {
+        "classes": classes,
+        "labels": [label for _, label in samples],
+        "files": [Path(path).relative_to(root).as_posix() for path, _ in samples],
+        "fingerprint": fingerprint,
+    }
+    with open(cache_dir / CACHE_INDEX, "w") as f:
+        json.dump(index, f)
+    return index
+
+class CachedImageFolder(Dataset):
+    """
+    Drop-in replacement for ImageFolder(root, transform=transform).
+
+    Images are decoded and resized once into a uint8 memmap next to `root`;
+    items are then read from the memmap and normalized on the fly, giving the
+    same tensors as `transform`. Sample order, classes and targets match
+    ImageFolder, so indices (e.g. hard_samples.npy) stay interchangeable. The
+    cache is rebuilt automatically when files under `root` change.
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+        folder = ImageFolder(str(self.root)) # Only scans the directory tree
+        self.classes = folder.classes
+        self.class_to_idx = folder.class_to_idx
+        self.samples = folder.samples
+        self.targets = folder.targets
+
+        self.fingerprint = fingerprint = _fingerprint(self.root, self.samples)
+        cache_dir = cache_dir_for(self.root)
+        index = None
+        if (cache_dir / CACHE_INDEX).exists() and (cache_dir / CACHE_IMAGES).exists():
+            with open(cache_dir / CACHE_INDEX) as f:
+                index = json.load(f)
+            if index.get("fingerprint") != fingerprint:
+                print(f"Image cache for {self.root} is stale; rebuilding.", flush=True)
+                index = None
+        if index is None:
+            build_image_cache(self.root, self.samples, self.classes, fingerprint)
+
+        self.images = np.load(cache_dir / CACHE_IMAGES, mmap_mode='r')
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        # HWC uint8 -> CHW float in [0, 1] (as ToTensor), then normalize
+        img = torch.from_numpy(np.array(self.images[idx])).permute(2, 0, 1).float().div(255)
+        return normalize(img), self.targets[idx]
+
 def get_loaders(base_dir, batch_size=16):
     # Determine the absolute path to the datasets directory relative to this file
     # Or just use the paths relative to the project root
@@ -19,9 +122,10 @@ def get_loaders(base_dir, batch_size=16):
     val_path = os.path.join(base_dir, "val")
     test_path = os.path.join(base_dir, "test")
 
-    train = ImageFolder(train_path, transform=transform)
-    val   = ImageFolder(val_path, transform=transform)
-    test  = ImageFolder(test_path, transform=transform)
+    # Decoded once into per-split caches, then read from memory maps every epoch
+    train = CachedImageFolder(train_path)
+    val   = CachedImageFolder(val_path)
+    test  = CachedImageFolder(test_path)
 
     return (
         DataLoader(train, batch_size=batch_size, shuffle=True),
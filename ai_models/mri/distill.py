@@ -0,0 +1,107 @@
+import torch
+from torch.optim import AdamW
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+from torch.utils.data import DataLoader
+import os
+import sys
+
+# Add project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from ai_models.distillation import measure_latency, report, train_student
+from ai_models.frozen_trunk import CACHE_FROZEN_TRUNK, TailModel, activation_loader
+from ai_models.mri.bagging_inference import MRIEnsemble
+from ai_models.mri.dataset import CachedImageFolder, normalize
+from ai_models.mri.logits_store import LogitsStore, ensemble_probs, registered_checkpoints
+from ai_models.mri.model import get_model
+
+# Hyperparameters
+BATCH_SIZE = 16
+LEARNING_RATE = 1e-4
+WEIGHT_DECAY = 1e-4
+EPOCHS = 10
+TEMPERATURE = float(os.environ.get("DISTILL_TEMPERATURE", 2.0))
+ALPHA = float(os.environ.get("DISTILL_ALPHA", 0.7)) # Weight of the soft-target loss
+DATA_DIR = os.path.join(project_root, 'datasets', 'MRI_CROPPED')
+TEACHERS = ['bag1', 'bag2', 'bag3']
+STUDENT_SAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'swin_student.pth')
+
+def distill():
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Using device: {device}", flush=True)
+
+    checkpoints = registered_checkpoints(TEACHERS)
+    if not checkpoints:
+        print("❌ Error: No bag checkpoints found. Run bagging_train.py first.", flush=True)
+        return
+    print(f"Teacher: {list(checkpoints)}", flush=True)
+
+    train_dir = os.path.join(DATA_DIR, 'train')
+    val_dir = os.path.join(DATA_DIR, 'val')
+    test_dir = os.path.join(DATA_DIR, 'test')
+
+    # Soft targets from the stored per-sample logits (each bag runs over the
+    # training split at most once, see logits_store.py); rows follow dataset order
+    store = LogitsStore(device=device)
+    train_results = store.evaluate(checkpoints, train_dir)
+    soft_targets = ensemble_probs(train_results.values())
+
+    train_dataset = CachedImageFolder(train_dir)
+    classes = train_dataset.classes
+    num_classes = len(classes)
+    train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True)
+    val_loader = DataLoader(CachedImageFolder(val_dir), batch_size=BATCH_SIZE, shuffle=False)
+
+    print("Initializing student Swin model...", flush=True)
+    student = get_model(num_classes=num_classes).to(device)
+    net = student
+    if CACHE_FROZEN_TRUNK:
+        # Same cache layout and key as train.py, so the activations are shared
+        train_loader = activation_loader(
+            student, train_loader, DATA_DIR + ".trunk/train", train_dataset.fingerprint, device, shuffle=True
+        )
+        val_loader = activation_loader(
+            student, val_loader, DATA_DIR + ".trunk/val", val_loader.dataset.fingerprint, device
+        )
+        net = TailModel(student)
+
+    optimizer = AdamW(
+        filter(lambda p: p.requires_grad, student.parameters()),
+        lr=LEARNING_RATE,
+        weight_decay=WEIGHT_DECAY
+    )
+    scheduler = ReduceLROnPlateau(optimizer, mode='max', factor=0.3, patience=2)
+
+    def save_student(model, val_acc):
+        # Bag checkpoint format (load_model_mri reads it as-is) plus the input stats
+        torch.save({
+            'model_state_dict': student.state_dict(),
+            'classes': classes,
+            'num_classes': num_classes,
+            'mean': list(normalize.mean),
+            'std': list(normalize.std)
+        }, STUDENT_SAVE_PATH)
+        print(f"--> Saved better student ({val_acc:.4f})", flush=True)
+
+    best = train_student(
+        net, optimizer, scheduler, train_loader.dataset, soft_targets, val_loader, device, EPOCHS,
+        save_student, batch_size=BATCH_SIZE, temperature=TEMPERATURE, alpha=ALPHA
+    )
+    print(f"Distillation complete. Best Val Acc: {best:.4f}", flush=True)
+
+    # Compare the saved (best) student with the ensemble on the test split
+    print(f"\n--- Student vs. ensemble on {test_dir} ---", flush=True)
+    test_results = store.evaluate(checkpoints, test_dir)
+    student_result = store.get(STUDENT_SAVE_PATH, test_dir)
+    labels = student_result.labels
+
+    teacher = MRIEnsemble([str(path) for path in checkpoints.values()], device).load()
+    student_only = MRIEnsemble([STUDENT_SAVE_PATH], device).load()
+    sample = [CachedImageFolder(test_dir)[0][0]]
+    teacher_ms = measure_latency(teacher.predict, sample)
+    student_ms = measure_latency(student_only.predict, sample)
+    report(student_result.probs, ensemble_probs(test_results.values()), labels, student_ms, teacher_ms, batch_size=1)
+
+if __name__ == "__main__":
+    distill()
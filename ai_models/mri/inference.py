@@ -10,6 +10,9 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.append(project_root)
 
 from ai_models.mri.model import get_model
+from ai_models.onnx_backend import load_onnx, use_onnx
+from ai_models.quantization import maybe_quantize
+from ai_models.shared_weights import build_shared, use_shared_weights
 
 # Constants for inference
 MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "swin_mri_1.pth")
@@ -30,8 +33,20 @@ _model = None
 
 def load_inference_model():
     global _model
+    if _model is None and use_onnx() and os.path.exists(MODEL_PATH):
+        # INFERENCE_BACKEND=onnx: run the exported graph (falls back to torch without one)
+        _model, _ = load_onnx(MODEL_PATH)
+        if _model is not None:
+            print(f"Loaded MRI model from {_model.path} (ONNX Runtime)")
+    if _model is None and use_shared_weights(DEVICE) and os.path.exists(MODEL_PATH):
+        # SHARED_WEIGHTS=1: weights are views of a memory map shared by all workers
+        _model, _ = build_shared(lambda meta: get_model(num_classes=meta['num_classes'], pretrained=False), MODEL_PATH)
+        if _model is not None:
+            _model, _ = maybe_quantize(_model, MODEL_PATH, DEVICE)
+            print(f"Loaded MRI model from {MODEL_PATH} (shared weights)")
     if _model is None:
-        _model = get_model().to(DEVICE)
+        # Weights come from the checkpoint, so skip the pretrained backbone
+        _model = get_model(pretrained=False).to(DEVICE)
         if os.path.exists(MODEL_PATH):
             checkpoint = torch.load(MODEL_PATH, map_location=DEVICE)
             if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
@@ -39,7 +54,9 @@ def load_inference_model():
             else:
                 _model.load_state_dict(checkpoint)
             _model.eval()
-            print(f"Loaded MRI model from {MODEL_PATH}")
+            # INT8 Linear layers when QUANTIZE_INFERENCE=1 and the checkpoint passed the gate
+            _model, quantized = maybe_quantize(_model, MODEL_PATH, DEVICE)
+            print(f"Loaded MRI model from {MODEL_PATH}{' (INT8)' if quantized else ''}")
         else:
             print(f"Warning: Model file {MODEL_PATH} not found. Inference might fail.")
     return _model
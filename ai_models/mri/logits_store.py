@@ -0,0 +1,117 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+# Add project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from ai_models.checkpoints import checkpoint_hash
+from ai_models.mri.model import get_model
+from ai_models.mri.dataset import CachedImageFolder
+
+MODEL_DIR = Path(__file__).resolve().parent
+STORE_DIR = MODEL_DIR / "logits"
+EVAL_BATCH_SIZE = 64
+
+# Every checkpoint the evaluation scripts know about (missing ones are skipped)
+REGISTERED_CHECKPOINTS = {
+    'bag1': MODEL_DIR / 'swin_bag1.pth',
+    'bag2': MODEL_DIR / 'swin_bag2.pth',
+    'bag3': MODEL_DIR / 'swin_bag3.pth',
+    'boosted': MODEL_DIR / 'swin_boosted.pth',
+    'best': Path(project_root) / 'best_mri_swin.pth',
+}
+
+def registered_checkpoints(names=None):
+    """{name: path} of the registered checkpoints that exist on disk."""
+    names = names or list(REGISTERED_CHECKPOINTS)
+    return {name: REGISTERED_CHECKPOINTS[name] for name in names if REGISTERED_CHECKPOINTS[name].exists()}
+
+def load_checkpoint_model(path, device):
+    """Builds the model of a dict-format or bare state_dict checkpoint."""
+    checkpoint = torch.load(path, map_location=device)
+    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+        state, num_classes = checkpoint['model_state_dict'], checkpoint.get('num_classes', 4)
+    else:
+        state, num_classes = checkpoint, 4
+    # Weights come from the checkpoint, so skip the pretrained timm download
+    model = get_model(num_classes=num_classes, pretrained=False).to(device)
+    model.load_state_dict(state)
+    model.eval()
+    return model
+
+class SplitLogits:
+    """Stored per-sample logits of one checkpoint on one split."""
+    def __init__(self, logits, labels, classes):
+        self.logits = logits
+        self.labels = labels
+        self.classes = classes
+
+    @property
+    def probs(self):
+        return F.softmax(torch.from_numpy(self.logits), dim=1).numpy()
+
+    @property
+    def preds(self):
+        return self.logits.argmax(axis=1)
+
+class LogitsStore:
+    """
+    Runs each checkpoint over a split once and persists its logits.
+
+    Entries are keyed by the checkpoint's content hash and the split's image
+    fingerprint (see CachedImageFolder), so retraining a model or changing the
+    data invalidates exactly the affected entries. Accuracy, confusion matrices,
+    hard-sample mining and ensemble combinations are then computed from the
+    stored arrays without touching the models again.
+    """
+    def __init__(self, store_dir=STORE_DIR, device=None):
+        self.store_dir = Path(store_dir)
+        self.device = device or torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self._datasets = {}
+
+    def _dataset(self, split_dir):
+        split_dir = str(Path(split_dir).resolve())
+        if split_dir not in self._datasets:
+            self._datasets[split_dir] = CachedImageFolder(split_dir)
+        return self._datasets[split_dir]
+
+    def get(self, checkpoint_path, split_dir):
+        dataset = self._dataset(split_dir)
+        key = f"{checkpoint_hash(checkpoint_path)[:16]}_{dataset.fingerprint[:16]}"
+        path = self.store_dir / f"{key}.npz"
+
+        if path.exists():
+            stored = np.load(path)
+            return SplitLogits(stored['logits'], stored['labels'], dataset.classes)
+
+        print(f"Computing logits of {Path(checkpoint_path).name} on {split_dir}...", flush=True)
+        model = load_checkpoint_model(checkpoint_path, self.device)
+        loader = DataLoader(dataset, batch_size=EVAL_BATCH_SIZE, shuffle=False)
+        all_logits = []
+        with torch.no_grad():
+            for images, _ in loader:
+                all_logits.append(model(images.to(self.device)).cpu().numpy())
+        del model
+
+        logits = np.concatenate(all_logits).astype(np.float32)
+        labels = np.asarray(dataset.targets, dtype=np.int64)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, logits=logits, labels=labels)
+        os.replace(tmp_path, path)
+        return SplitLogits(logits, labels, dataset.classes)
+
+    def evaluate(self, checkpoints, split_dir):
+        """{name: SplitLogits} for a {name: path} mapping (see registered_checkpoints)."""
+        return {name: self.get(path, split_dir) for name, path in checkpoints.items()}
+
+def ensemble_probs(results):
+    """Averaged softmax probabilities of several SplitLogits."""
+    return np.mean([r.probs for r in results], axis=0)
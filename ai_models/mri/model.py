@@ -1,12 +1,9 @@
-import timm
-import torch.nn as nn
+from ai_models.model_factory import create_swin
 
-def get_model(num_classes=4):
-    model = timm.create_model(
-        "swin_tiny_patch4_window7_224",
-        pretrained=True,
-        num_classes=num_classes
-    )
+def get_model(num_classes=4, pretrained=True):
+    # Pretrained weights come from the local cache (see model_factory.py);
+    # pretrained=False, used whenever a checkpoint is loaded next, never hits the network
+    model = create_swin(num_classes, pretrained=pretrained)
 
     # Freeze early layers
     # Consistent with voice model choice to keep some layers trainable
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+from torch.utils.data import DataLoader
+
+# Add project root to sys.path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from ai_models.mri.dataset import CachedImageFolder
+from ai_models.mri.logits_store import EVAL_BATCH_SIZE, REGISTERED_CHECKPOINTS, load_checkpoint_model
+from ai_models.mri.bagging_inference import _candidate_model_paths
+from ai_models.mri.inference import MODEL_PATH
+from ai_models.quantization import MIN_AGREEMENT, gate
+
+def check(checkpoint_path, split='test', min_agreement=MIN_AGREEMENT):
+    """Runs the INT8 accuracy gate for one MRI checkpoint. Returns True when published."""
+    print(f"\n--- {checkpoint_path} ---")
+    split_dir = os.path.join(project_root, 'datasets', 'MRI_CROPPED', split)
+    if not os.path.exists(split_dir):
+        print(f"❌ Error: {split_dir} not found.")
+        return False
+
+    model = load_checkpoint_model(checkpoint_path, 'cpu')
+    loader = DataLoader(CachedImageFolder(split_dir), batch_size=EVAL_BATCH_SIZE, shuffle=False)
+    return gate(model, loader, checkpoint_path, min_agreement)["approved"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish INT8 MRI models that agree with fp32 on the test split")
+    parser.add_argument('checkpoints', nargs='*', help="defaults to the checkpoints the MRI inference loaders use")
+    parser.add_argument('--split', default='test', choices=['val', 'test'])
+    parser.add_argument('--min-agreement', type=float, default=MIN_AGREEMENT)
+    args = parser.parse_args()
+
+    # The single-model loader (inference.py), the ensemble candidates and the
+    # best single model from train.py
+    defaults = dict.fromkeys([MODEL_PATH] + _candidate_model_paths() + [str(REGISTERED_CHECKPOINTS['best'])])
+    paths = args.checkpoints or [p for p in defaults if os.path.exists(p)]
+    if not paths:
+        print("❌ Error: No MRI checkpoints found.")
+        sys.exit(1)
+    results = [check(path, args.split, args.min_agreement) for path in paths]
+    sys.exit(0 if all(results) else 1)
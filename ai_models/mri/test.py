@@ -17,7 +17,8 @@ def test_model():
     base_dir = os.path.join("datasets", "MRI_SPLIT")
     _, _, test_loader = get_loaders(base_dir)
 
-    model = get_model().to(device)
+    # Weights come from the checkpoint, so skip the pretrained backbone
+    model = get_model(pretrained=False).to(device)
     model_path = "best_mri_swin.pth"
     
     if not os.path.exists(model_path):
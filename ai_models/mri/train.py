@@ -9,9 +9,11 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
+from ai_models.frozen_trunk import CACHE_FROZEN_TRUNK, TailModel, activation_loader
 from ai_models.mri.dataset import get_loaders
 from ai_models.mri.model import get_model
 
+
 def train_model():
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Using device: {device}")
@@ -28,6 +30,16 @@ def train_model():
 
     model = get_model().to(device)
 
+    net = model
+    if CACHE_FROZEN_TRUNK:
+        train_loader = activation_loader(
+            model, train_loader, base_dir + ".trunk/train", train_loader.dataset.fingerprint, device, shuffle=True
+        )
+        val_loader = activation_loader(
+            model, val_loader, base_dir + ".trunk/val", val_loader.dataset.fingerprint, device
+        )
+        net = TailModel(model)
+
     criterion = nn.CrossEntropyLoss()
     optimizer = AdamW(
         filter(lambda p: p.requires_grad, model.parameters()),
@@ -40,24 +52,24 @@ def train_model():
     num_epochs = 25
 
     for epoch in range(num_epochs):
-        model.train()
+        net.train()
         total_loss = 0
 
         for x, y in train_loader:
             x, y = x.to(device), y.to(device)
             optimizer.zero_grad()
-            out = model(x)
+            out = net(x)
             loss = criterion(out, y)
             loss.backward()
             optimizer.step()
             total_loss += loss.item()
 
-        model.eval()
+        net.eval()
         correct = total = 0
         with torch.no_grad():
             for x, y in val_loader:
                 x, y = x.to(device), y.to(device)
-                preds = model(x).argmax(1)
+                preds = net(x).argmax(1)
                 correct += (preds == y).sum().item()
                 total += y.size(0)
 
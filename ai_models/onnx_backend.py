@@ -0,0 +1,204 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ai_models.checkpoints import checkpoint_hash
+
+# "torch" (eager PyTorch) or "onnx" (ONNX Runtime, CPU provider); chosen per deployment
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch").lower()
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", 0)) # 0 = onnxruntime default (physical cores)
+ONNX_OPSET = 17
+IMG_SIZE = 224
+
+def use_onnx():
+    return INFERENCE_BACKEND == "onnx"
+
+def onnx_path_for(checkpoint_path):
+    """Exported graph of a checkpoint, e.g. best_model.pth -> best_model.pth.onnx"""
+    checkpoint_path = Path(checkpoint_path)
+    return checkpoint_path.with_name(checkpoint_path.name + ".onnx")
+
+def _meta_path(checkpoint_path):
+    onnx_path = onnx_path_for(checkpoint_path)
+    return onnx_path.with_name(onnx_path.name + ".json")
+
+class OnnxModel:
+    """
+    ONNX Runtime session with the calling convention of the eager model:
+    model(batch) takes a float (N, 3, H, W) tensor and returns logits as a
+    CPU tensor, so the existing normalize/softmax code around it is unchanged.
+    A numpy batch gets numpy logits back, and then torch is never imported.
+    """
+    def __init__(self, onnx_path, num_threads=ONNX_THREADS):
+        import onnxruntime as ort # Only deployments using this backend need it
+
+        # One request at a time per session: all graph optimizations, operators run
+        # sequentially and each one is parallelized over the intra-op pool
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = str(onnx_path)
+        self.session = ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        if isinstance(x, np.ndarray):
+            return self.session.run(None, {self.input_name: x.astype(np.float32, copy=False)})[0]
+        import torch
+
+        batch = x.detach().cpu().numpy().astype(np.float32, copy=False)
+        return torch.from_numpy(self.session.run(None, {self.input_name: batch})[0])
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+def load_meta(checkpoint_path):
+    """
+    The metadata (classes, mean, std, num_classes) stored with an export, or
+    None when there is no export or it was made from a different checkpoint.
+    """
+    meta_path = _meta_path(checkpoint_path)
+    if not meta_path.exists() or not onnx_path_for(checkpoint_path).exists():
+        print(f"Warning: no ONNX export of {checkpoint_path}; run ai_models/export_onnx.py.")
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("checkpoint_sha256") != checkpoint_hash(checkpoint_path):
+        print(f"Warning: ONNX export of {checkpoint_path} is stale; run ai_models/export_onnx.py.")
+        return None
+    return meta
+
+def load_onnx(checkpoint_path):
+    """(OnnxModel, meta) for an up-to-date export of `checkpoint_path`, else (None, None)."""
+    meta = load_meta(checkpoint_path)
+    if meta is None:
+        return None, None
+    return OnnxModel(onnx_path_for(checkpoint_path)), meta
+
+def _torchscript_exporter_kwargs(torch):
+    """
+    Newer torch releases default torch.onnx.export to the dynamo exporter, which
+    specializes the shapes `dynamic_axes` marks as symbolic; the TorchScript
+    exporter keeps them dynamic.
+    """
+    import inspect
+
+    return {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+
+def export(model, checkpoint_path, meta=None, opset=ONNX_OPSET, input_shape=(3, IMG_SIZE, IMG_SIZE),
+           dynamic_input_axes=None):
+    """
+    Writes `<checkpoint>.onnx` (dynamic batch dimension, plus any extra
+    {axis: name} in `dynamic_input_axes`) from an eager model built from
+    `checkpoint_path`, plus a JSON sidecar holding `meta` and the checkpoint
+    hash, so loaders can skip the checkpoint entirely.
+
+    The nn.MultiheadAttention fast path is disabled while tracing: under eval
+    and no_grad nn.TransformerEncoder otherwise dispatches to
+    aten::_transformer_encoder_layer_fwd, which has no ONNX export.
+    """
+    import torch
+
+    model = model.cpu().eval()
+    onnx_path = onnx_path_for(checkpoint_path)
+    tmp_path = onnx_path.with_name(onnx_path.name + ".tmp")
+    dummy = torch.randn(1, *input_shape)
+    mha = getattr(torch.backends, 'mha', None)
+    fastpath = mha.get_fastpath_enabled() if mha is not None else None
+    try:
+        if mha is not None:
+            mha.set_fastpath_enabled(False)
+        with torch.no_grad():
+            torch.onnx.export(
+                model, dummy, str(tmp_path),
+                input_names=['input'], output_names=['logits'],
+                dynamic_axes={'input': {0: 'batch', **(dynamic_input_axes or {})}, 'logits': {0: 'batch'}},
+                opset_version=opset,
+                **_torchscript_exporter_kwargs(torch),
+            )
+    finally:
+        if mha is not None:
+            mha.set_fastpath_enabled(fastpath)
+    os.replace(tmp_path, onnx_path)
+
+    meta = dict(meta or {})
+    meta["checkpoint_sha256"] = checkpoint_hash(checkpoint_path)
+    meta["opset"] = opset
+    with open(_meta_path(checkpoint_path), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Exported {checkpoint_path} -> {onnx_path}")
+    return onnx_path
+
+def remove_export(checkpoint_path):
+    """Deletes the export of a checkpoint (e.g. after a failed parity check) so loaders fall back to torch."""
+    for path in (onnx_path_for(checkpoint_path), _meta_path(checkpoint_path)):
+        if path.exists():
+            path.unlink()
+
+def _median_ms(fn, x, repeats=20, warmup=3):
+    timings = []
+    for i in range(warmup + repeats):
+        start = time.perf_counter()
+        fn(x)
+        if i >= warmup:
+            timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def check_parity(model, onnx_model, input_shapes, batch_sizes=(1, 4, 16), seed=0):
+    """
+    Compares eager CPU and ONNX Runtime outputs on random inputs for every
+    (batch size, input shape) pair, so each dynamic axis is exercised away from
+    the traced shape. Returns [{batch_size, input_shape, max_abs_diff,
+    agreement, error}]; `error` is set when onnxruntime rejects the input.
+    """
+    import torch
+
+    model = model.cpu().eval()
+    generator = torch.Generator().manual_seed(seed)
+    results = []
+    with torch.no_grad():
+        for input_shape in input_shapes:
+            for batch_size in batch_sizes:
+                x = torch.randn(batch_size, *input_shape, generator=generator)
+                result = {"batch_size": batch_size, "input_shape": tuple(input_shape), "error": None}
+                try:
+                    expected, actual = model(x), onnx_model(x)
+                    result["max_abs_diff"] = float((expected - actual).abs().max())
+                    result["agreement"] = float((expected.argmax(1) == actual.argmax(1)).float().mean())
+                except Exception as e:
+                    result.update(max_abs_diff=float('inf'), agreement=0.0, error=str(e))
+                results.append(result)
+    return results
+
+def parity_and_benchmark(model, onnx_model, batch_sizes=(1, 4, 16), seed=0, input_shape=(3, IMG_SIZE, IMG_SIZE),
+                         extra_input_shapes=()):
+    """
+    Checks parity at every batch size for `input_shape` and each of
+    `extra_input_shapes` (other sizes along the extra dynamic axes), then times
+    eager CPU and ONNX Runtime at `input_shape`.
+    Returns (parity results, {batch_size: {torch_ms, onnx_ms}}); timings are
+    skipped when any parity check failed.
+    """
+    import torch
+
+    model = model.cpu().eval()
+    parity = check_parity(model, onnx_model, [input_shape, *extra_input_shapes], batch_sizes, seed)
+    if any(r["error"] for r in parity):
+        return parity, {}
+
+    generator = torch.Generator().manual_seed(seed)
+    timings = {}
+    with torch.no_grad():
+        for batch_size in batch_sizes:
+            x = torch.randn(batch_size, *input_shape, generator=generator)
+            timings[batch_size] = {"torch_ms": _median_ms(model, x), "onnx_ms": _median_ms(onnx_model, x)}
+    return parity, timings
@@ -0,0 +1,127 @@
+import copy
+import io
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from ai_models.checkpoints import checkpoint_hash
+
+# Opt-in: quantized models are only served when this is set *and* the
+# checkpoint has passed the accuracy gate (see publish())
+QUANTIZE_INFERENCE = os.environ.get("QUANTIZE_INFERENCE", "0") == "1"
+# Minimum top-1 agreement between INT8 and fp32 predictions required to publish
+MIN_AGREEMENT = float(os.environ.get("QUANTIZE_MIN_AGREEMENT", 0.99))
+APPROVAL_SUFFIX = ".int8.json"
+
+def approval_path(checkpoint_path):
+    """Gate result of a checkpoint, e.g. best_model.pth -> best_model.pth.int8.json"""
+    checkpoint_path = Path(checkpoint_path)
+    return checkpoint_path.with_name(checkpoint_path.name + APPROVAL_SUFFIX)
+
+def is_approved(checkpoint_path):
+    """True when the gate passed for exactly this checkpoint file."""
+    path = approval_path(checkpoint_path)
+    if not path.exists():
+        return False
+    with open(path) as f:
+        approval = json.load(f)
+    return approval.get("approved", False) and approval.get("checkpoint_sha256") == checkpoint_hash(checkpoint_path)
+
+def quantize_dynamic(model):
+    """
+    INT8 dynamic quantization of every nn.Linear (weights stored as int8,
+    activations quantized per batch at run time). Returns a CPU copy in eval
+    mode; the fp32 model is left untouched.
+    """
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('fbgemm', 'x86', 'qnnpack'):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            break
+    model = copy.deepcopy(model).cpu().eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def maybe_quantize(model, checkpoint_path, device):
+    """
+    What the inference loaders call after building a model: returns
+    (model, quantized). Quantization only happens when QUANTIZE_INFERENCE is on,
+    the device is the CPU and the checkpoint has been approved.
+    """
+    if not QUANTIZE_INFERENCE:
+        return model, False
+    if torch.device(device).type != 'cpu':
+        print(f"Warning: INT8 inference is CPU-only; serving fp32 {checkpoint_path} on {device}.")
+        return model, False
+    if not is_approved(checkpoint_path):
+        print(f"Warning: {checkpoint_path} has not passed the INT8 accuracy gate; serving fp32.")
+        return model, False
+    return quantize_dynamic(model), True
+
+def weight_bytes(model):
+    """Serialized size of the model's state (packed INT8 weights included)."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+def collect_probs(model, loader):
+    """Softmax outputs (N, C) and labels (N,) of a CPU model over a loader, with wall time."""
+    probs, labels = [], []
+    start = time.perf_counter()
+    with torch.no_grad():
+        for images, batch_labels in loader:
+            probs.append(F.softmax(model(images.cpu()), dim=1).numpy())
+            labels.append(np.asarray(batch_labels))
+    return np.concatenate(probs), np.concatenate(labels), time.perf_counter() - start
+
+def gate(model, loader, checkpoint_path, min_agreement=MIN_AGREEMENT):
+    """
+    Compares the INT8 version of `model` with the fp32 one on `loader` (the test
+    split, normalized as the model expects) and writes the approval file next
+    to the checkpoint. The quantized model is published only when top-1
+    agreement reaches `min_agreement`; otherwise the approval is withdrawn.
+    Returns the gate result.
+    """
+    fp32 = copy.deepcopy(model).cpu().eval()
+    int8 = quantize_dynamic(fp32)
+
+    fp32_probs, labels, fp32_time = collect_probs(fp32, loader)
+    int8_probs, _, int8_time = collect_probs(int8, loader)
+    fp32_preds, int8_preds = fp32_probs.argmax(axis=1), int8_probs.argmax(axis=1)
+
+    result = {
+        "checkpoint_sha256": checkpoint_hash(checkpoint_path),
+        "samples": int(len(labels)),
+        "agreement": float(np.mean(fp32_preds == int8_preds)),
+        "max_prob_diff": float(np.abs(fp32_probs - int8_probs).max()),
+        "fp32_accuracy": float(np.mean(fp32_preds == labels)),
+        "int8_accuracy": float(np.mean(int8_preds == labels)),
+        "fp32_seconds": fp32_time,
+        "int8_seconds": int8_time,
+        "fp32_weight_bytes": weight_bytes(fp32),
+        "int8_weight_bytes": weight_bytes(int8),
+        "min_agreement": min_agreement,
+    }
+    result["approved"] = result["agreement"] >= min_agreement
+
+    path = approval_path(checkpoint_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, path)
+
+    print(f"Samples: {result['samples']}")
+    print(f"Agreement INT8 vs fp32: {result['agreement']:.2%} (required {min_agreement:.2%})")
+    print(f"Accuracy: fp32 {result['fp32_accuracy']:.4f} | INT8 {result['int8_accuracy']:.4f}")
+    print(f"Time: fp32 {fp32_time:.2f}s | INT8 {int8_time:.2f}s ({fp32_time / max(int8_time, 1e-9):.2f}x)")
+    print(f"Weights: fp32 {result['fp32_weight_bytes'] / 2**20:.1f} MB | INT8 {result['int8_weight_bytes'] / 2**20:.1f} MB")
+    if result["approved"]:
+        print(f"✔ INT8 model published ({path}).")
+    else:
+        print(f"❌ Agreement below threshold; INT8 model NOT published ({path}).")
+    return result
@@ -0,0 +1,131 @@
+import json
+import mmap
+import os
+import struct
+import warnings
+from pathlib import Path
+
+import torch
+
+from ai_models.checkpoints import checkpoint_hash
+
+# Opt-in: build inference models on read-only memory maps of `<checkpoint>.weights`,
+# so every worker process on a host shares one physical copy of the weights
+SHARED_WEIGHTS = os.environ.get("SHARED_WEIGHTS", "0") == "1"
+WEIGHTS_SUFFIX = ".weights"
+
+# safetensors dtype names
+_DTYPES = {
+    torch.float64: "F64", torch.float32: "F32", torch.float16: "F16", torch.bfloat16: "BF16",
+    torch.int64: "I64", torch.int32: "I32", torch.int16: "I16", torch.int8: "I8",
+    torch.uint8: "U8", torch.bool: "BOOL",
+}
+_TORCH_DTYPES = {name: dtype for dtype, name in _DTYPES.items()}
+
+def use_shared_weights(device):
+    """Shared pages only help on the CPU; GPU models are copied to the device anyway."""
+    return SHARED_WEIGHTS and torch.device(device).type == 'cpu'
+
+def weights_path_for(checkpoint_path):
+    """Flat weight file of a checkpoint, e.g. best_model.pth -> best_model.pth.weights"""
+    checkpoint_path = Path(checkpoint_path)
+    return checkpoint_path.with_name(checkpoint_path.name + WEIGHTS_SUFFIX)
+
+def save_flat(state_dict, checkpoint_path, meta=None):
+    """
+    Writes `state_dict` in the safetensors layout (u64 header length, JSON
+    header with dtype/shape/data_offsets per tensor, raw little-endian data)
+    next to the checkpoint. Tensors are ordered by element size so every one
+    of them starts aligned; `meta` (classes, mean, std, ...) and the checkpoint
+    hash go in the header's __metadata__.
+    """
+    tensors = {name: t.detach().cpu().contiguous() for name, t in state_dict.items()}
+    order = sorted(tensors, key=lambda name: -tensors[name].element_size())
+
+    header, offset = {}, 0
+    for name in order:
+        t = tensors[name]
+        nbytes = t.numel() * t.element_size()
+        header[name] = {"dtype": _DTYPES[t.dtype], "shape": list(t.shape), "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+    metadata = dict(meta or {})
+    stat = os.stat(checkpoint_path)
+    metadata["checkpoint_sha256"] = checkpoint_hash(checkpoint_path)
+    # Size and mtime let loaders skip re-hashing an unchanged checkpoint
+    metadata["checkpoint_size"] = stat.st_size
+    metadata["checkpoint_mtime_ns"] = stat.st_mtime_ns
+    header["__metadata__"] = {"meta": json.dumps(metadata)}
+
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-len(header_bytes) % 8) # Data starts 8-byte aligned
+
+    path = weights_path_for(checkpoint_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name in order:
+            f.write(tensors[name].reshape(-1).view(torch.uint8).numpy().tobytes())
+    os.replace(tmp_path, path)
+    print(f"Wrote {path} ({offset / 2**20:.1f} MB)")
+    return path
+
+def _is_current(meta, checkpoint_path):
+    """True when the weight file was written from this checkpoint; hashes only if size or mtime differ."""
+    stat = os.stat(checkpoint_path)
+    if (meta.get("checkpoint_size"), meta.get("checkpoint_mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+        return True
+    return meta.get("checkpoint_sha256") == checkpoint_hash(checkpoint_path)
+
+def load_flat(checkpoint_path):
+    """
+    (state_dict, meta) whose tensors are read-only views into a shared memory
+    map of `<checkpoint>.weights`, or (None, None) when the file is missing or
+    was written from a different checkpoint. The tensors must not be written
+    to; they back eval-mode models only.
+    """
+    path = weights_path_for(checkpoint_path)
+    if not path.exists():
+        print(f"Warning: no shared weight file for {checkpoint_path}; run ai_models/export_shared_weights.py.")
+        return None, None
+
+    with open(path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+        meta = json.loads(header.pop("__metadata__", {}).get("meta", "{}"))
+        if not _is_current(meta, checkpoint_path):
+            print(f"Warning: shared weight file of {checkpoint_path} is stale; run ai_models/export_shared_weights.py.")
+            return None, None
+        # ACCESS_READ maps the page cache pages themselves: no private copy per process
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    data_start = 8 + header_len
+    state_dict = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore") # frombuffer warns that the mapping is read-only
+        for name, entry in header.items():
+            dtype = _TORCH_DTYPES[entry["dtype"]]
+            begin, end = entry["data_offsets"]
+            count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+            t = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + begin) if count else torch.empty(0, dtype=dtype)
+            state_dict[name] = t.view(entry["shape"])
+    return state_dict, meta
+
+def build_shared(factory, checkpoint_path):
+    """
+    Builds `factory(meta)` on the CPU and points its parameters and persistent
+    buffers at the memory-mapped tensors. Returns (model, meta), or (None, None)
+    without an up-to-date weight file.
+
+    The module is built for real rather than on the meta device: non-persistent
+    buffers (Swin's relative_position_index and attn_mask) are not in the state
+    dict and must come from the constructor. The freshly initialized weights
+    are released once the mapped ones are assigned.
+    """
+    state_dict, meta = load_flat(checkpoint_path)
+    if state_dict is None:
+        return None, None
+    model = factory(meta)
+    model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    return model, meta
@@ -1,16 +1,176 @@
+import copy
+import math
+import os
+import threading
+from pathlib import Path
+
 import torch
 import torch.nn.functional as F
-from swin_model import SwinTransformer
-import numpy as np
-import os
+from torch.func import functional_call, stack_module_state, vmap
+
+from model_registry import build_model, default_device
 
 def load_model(model_path, device):
-    checkpoint = torch.load(model_path, map_location=device)
-    classes = checkpoint['classes']
-    model = SwinTransformer(num_classes=len(classes)).to(device)
-    model.load_state_dict(checkpoint['model_state_dict'])
-    model.eval()
-    return model, checkpoint['mean'], checkpoint['std'], classes
+    loaded = build_model(model_path, device)
+    return loaded.model, loaded.mean, loaded.std, loaded.classes
+
+class VoiceEnsemble:
+    """
+    Bagged voice models loaded once and evaluated together.
+
+    The members' weights are stacked into one set of batched tensors so a single
+    vmapped forward pass runs every model at once; the per-member modules are not
+    kept around. All members must share the same class list and normalization
+    stats (bagging_train.py saves the global training stats in every checkpoint).
+
+    INT8-quantized members keep their weights in packed (non-parameter) form
+    and ONNX members have no torch weights at all; neither can be stacked, so
+    an ensemble of them runs the members one by one. So does an ensemble of
+    shared-weight members, since stacking would copy the memory-mapped weights
+    into private tensors.
+    """
+    def __init__(self, members, stat_tolerance=1e-4):
+        if not members:
+            raise ValueError("VoiceEnsemble needs at least one model.")
+
+        first = members[0]
+        for member in members[1:]:
+            if member.arch != first.arch:
+                raise ValueError(
+                    f"Architecture mismatch: {member.path} is {member.arch}, {first.path} is {first.arch}"
+                )
+            if list(member.classes) != list(first.classes):
+                raise ValueError(
+                    f"Class mismatch: {member.path} has {member.classes}, "
+                    f"{first.path} has {first.classes}"
+                )
+            for name in ('mean', 'std'):
+                a, b = float(getattr(member, name)), float(getattr(first, name))
+                if not math.isclose(a, b, rel_tol=stat_tolerance, abs_tol=stat_tolerance):
+                    raise ValueError(
+                        f"Normalization mismatch: {member.path} has {name}={a}, "
+                        f"{first.path} has {name}={b}"
+                    )
+
+        self.classes = list(first.classes)
+        self.mean = float(first.mean)
+        self.std = float(first.std)
+        self.device = first.device
+        self.paths = [member.path for member in members]
+        self.mtimes = [member.mtime for member in members]
+
+        if any(member.quantized or member.shared or member.backend != 'torch' for member in members):
+            self._modules = [member.model for member in members]
+            self._use_vmap = False
+            return
+        self._modules = None
+
+        # One stacked tensor per parameter/buffer, leading dim = member index
+        self.params, self.buffers = stack_module_state([member.model for member in members])
+
+        # Stateless skeleton the stacked weights are plugged into
+        self._base = copy.deepcopy(first.model).to('meta')
+        self._vmapped = vmap(self._forward_one, in_dims=(0, 0, None))
+        self._use_vmap = True
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def dementia_idx(self):
+        try:
+            return self.classes.index('dementia')
+        except ValueError:
+            return 0 # Fallback
+
+    def _forward_one(self, params, buffers, x):
+        return functional_call(self._base, (params, buffers), (x,))
+
+    def _member_logits(self, x):
+        if self._modules is not None:
+            return torch.stack([model(x) for model in self._modules])
+        if self._use_vmap:
+            try:
+                return self._vmapped(self.params, self.buffers, x)
+            except Exception as e:
+                # Some torch/timm combinations have ops without batching rules
+                print(f"Warning: vmapped ensemble forward failed ({e}). Falling back to per-member loop.")
+                self._use_vmap = False
+
+        outputs = []
+        for i in range(len(self)):
+            params = {name: value[i] for name, value in self.params.items()}
+            buffers = {name: value[i] for name, value in self.buffers.items()}
+            outputs.append(self._forward_one(params, buffers, x))
+        return torch.stack(outputs)
+
+    def member_probs(self, mfcc_tensor):
+        """
+        Per-member softmax probabilities, (M, N, num_classes) on the CPU, for
+        un-normalized input of shape (3, H, W) or (N, 3, H, W).
+        """
+        img = (mfcc_tensor - self.mean) / (self.std + 1e-6)
+        if img.dim() == 3:
+            img = img.unsqueeze(0) # Add batch dim
+
+        with torch.no_grad():
+            logits = self._member_logits(img.to(self.device)) # (M, N, C)
+            return F.softmax(logits, dim=-1).cpu()
+
+    def predict_proba(self, mfcc_tensor):
+        """
+        Averaged softmax probabilities for un-normalized MFCC input of shape
+        (3, H, W) or (N, 3, H, W). Returns an (N, num_classes) tensor on the CPU.
+        """
+        return self.member_probs(mfcc_tensor).mean(dim=0)
+
+    def predict(self, mfcc_tensor):
+        """Returns (class_name, confidence) for every row of the input."""
+        avg_probs = self.predict_proba(mfcc_tensor)
+        confidence, idx = avg_probs.max(dim=1)
+        return [(self.classes[i], c) for i, c in zip(idx.tolist(), confidence.tolist())]
+
+class EnsembleCache:
+    """
+    Process-resident VoiceEnsembles keyed by the member checkpoint paths and
+    device. Like the model registry, an ensemble is rebuilt when any member's
+    file changes on disk.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def get(self, model_paths, device=None):
+        device = torch.device(device) if device is not None else default_device()
+
+        paths = []
+        for m_path in model_paths:
+            if not os.path.exists(m_path):
+                print(f"Warning: Model {m_path} not found. Skipping.")
+                continue
+            paths.append(str(Path(m_path).resolve()))
+        if not paths:
+            return None
+
+        key = (tuple(paths), str(device))
+        mtimes = [os.path.getmtime(path) for path in paths]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.mtimes != mtimes:
+                members = [build_model(path, device, mtime) for path, mtime in zip(paths, mtimes)]
+                entry = VoiceEnsemble(members)
+                self._entries[key] = entry
+            return entry
+
+    def evict(self):
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+# Shared by every caller in the process
+ensembles = EnsembleCache()
 
 def predict_ensemble(mfcc_tensor, model_paths, device):
     """
@@ -20,48 +180,21 @@ def predict_ensemble(mfcc_tensor, model_paths, device):
     p3 = softmax(model3(x))
     final_pred = (p1 + p2 + p3) / 3
     Final class = argmax(final_pred)
+
+    The members are loaded once per process (see EnsembleCache) and run in one
+    vectorized forward pass.
     """
-    all_probs = []
-    
-    # We assume all models share the same classes and preprocessing logic for simplicity,
-    # but we load mean/std from each checkpoint as saved in bagging_train.py
-    
-    with torch.no_grad():
-        for m_path in model_paths:
-            if not os.path.exists(m_path):
-                print(f"Warning: Model {m_path} not found. Skipping.")
-                continue
-                
-            model, mean, std, classes = load_model(m_path, device)
-            
-            # Normalize specific to this model's training stats
-            img = (mfcc_tensor - mean) / (std + 1e-6)
-            img = img.to(device)
-            if img.dim() == 3:
-                img = img.unsqueeze(0) # Add batch dim
-            
-            logits = model(img)
-            probs = F.softmax(logits, dim=1)
-            all_probs.append(probs.cpu().numpy())
-            
-    if not all_probs:
+    ensemble = ensembles.get(model_paths, device)
+    if ensemble is None:
         return None, None
-        
-    # Average softmax probabilities
-    avg_probs = np.mean(all_probs, axis=0)
-    final_class_idx = np.argmax(avg_probs, axis=1)[0]
-    
-    # Get the class name using the last loaded classes (assuming they are identical)
-    final_class_name = classes[final_class_idx]
-    confidence = avg_probs[0][final_class_idx]
-    
-    return final_class_name, confidence
+
+    return ensemble.predict(mfcc_tensor)[0]
 
 if __name__ == "__main__":
     # Example usage (requires swin_1.pth, swin_2.pth, swin_3.pth to exist)
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model_files = ['swin_1.pth', 'swin_2.pth', 'swin_3.pth']
-    
-    # For testing, we need an MFCC tensor. 
+
+    # For testing, we need an MFCC tensor.
     # This is normally provided by the dataset or the preprocessing pipeline.
     print("Bagging Inference script ready. Use predict_ensemble() in your application pipeline.")
@@ -1,60 +1,246 @@
+import hashlib
+import json
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-# Ensure current directory is in path for imports
-sys.path.append(os.getcwd())
+# Ensure this directory is in path for imports (also in spawned worker processes)
+sys.path.append(str(Path(__file__).resolve().parent))
 
-from preprocess_audio import preprocess_audio
-from utils import extract_mfcc
+import numpy as np
+
+from dataset import load_shard_index, pack_shard
+from feature_cache import FeatureCache, DEFAULT_PARAMS
 
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 RAW_ROOT = PROJECT_ROOT / "datasets" / "dementianet"
 MFCC_ROOT = PROJECT_ROOT / "datasets" / "voice_mfcc"
+MANIFEST_NAME = "manifest.json"
 
 SPLITS = ["train_audio", "val_audio", "test_audio"]
 CLASSES = ["dementia", "healthy"]
 
-def main():
-    print("Starting MFCC Dataset Building...")
+# Files per task handed to a worker (featurized together with compute_mfcc_batch)
+CHUNK_SIZE = 32
+NUM_WORKERS = int(os.environ.get("MFCC_BUILD_WORKERS", min(8, os.cpu_count() or 1)))
+# "raw" (3, 40, T) float32 or "resized" (3, 224, 224) float16, see dataset.pack_shard
+SHARD_LAYOUT = os.environ.get("MFCC_SHARD_LAYOUT", "raw")
+
+# Builder-local, memory-only cache (one per worker process): the training corpus
+# must not fill the inference-side disk cache, and the manifest already skips
+# unchanged recordings between runs
+build_cache = FeatureCache(cache_dir=None)
+
+def params_hash(params=DEFAULT_PARAMS):
+    """Short hash of the feature settings; outputs built with other settings are rebuilt."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+def load_manifest(mfcc_root=MFCC_ROOT):
+    path = Path(mfcc_root) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable manifest {path}: {e}")
+        return {}
 
+def save_manifest(files, mfcc_root=MFCC_ROOT):
+    path = Path(mfcc_root) / MANIFEST_NAME
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"params_hash": params_hash(), "files": files}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def is_up_to_date(source, output, entry, current_hash):
+    """
+    An output is kept when it exists, was built with the current feature
+    parameters, and is newer than its source (or the source still has the size
+    and mtime recorded in the manifest).
+    """
+    if entry is None or entry.get("params") != current_hash or not output.exists():
+        return False
+    src_stat = source.stat()
+    if output.stat().st_mtime >= src_stat.st_mtime:
+        return True
+    return entry.get("source_size") == src_stat.st_size and entry.get("source_mtime") == src_stat.st_mtime
+
+def collect_tasks(manifest, current_hash):
+    """Returns (stale [(source, output)], number of up-to-date outputs)."""
+    stale = []
+    skipped = 0
     for split in SPLITS:
         # Determine target split name (e.g., train_audio -> train)
         target_split = split.split('_')[0]
-        
+
         for class_name in CLASSES:
             input_dir = RAW_ROOT / split / class_name
             output_dir = MFCC_ROOT / target_split / class_name
-            
+
             output_dir.mkdir(parents=True, exist_ok=True)
-            
+
             if not input_dir.exists():
                 print(f"Warning: Input directory not found: {input_dir}")
                 continue
 
-            all_files = list(input_dir.glob("*.wav"))
+            for source in sorted(input_dir.glob("*.wav")):
+                output = output_dir / (source.stem + ".npy")
+                key = output.relative_to(MFCC_ROOT).as_posix()
+                if is_up_to_date(source, output, manifest.get(key), current_hash):
+                    skipped += 1
+                else:
+                    stale.append((source, output))
+    return stale, skipped
+
+def prune_orphans(manifest):
+    """
+    Deletes outputs (and their manifest entries) whose source recording no
+    longer exists, so deleted or renamed recordings drop out of the split and
+    its shard. Classes whose input directory is missing altogether are left
+    alone. Returns the number of outputs removed.
+    """
+    removed = 0
+    for split in SPLITS:
+        target_split = split.split('_')[0]
+        for class_name in CLASSES:
+            input_dir = RAW_ROOT / split / class_name
+            output_dir = MFCC_ROOT / target_split / class_name
+            if not input_dir.exists() or not output_dir.exists():
+                continue
+
+            sources = {source.stem for source in input_dir.glob("*.wav")}
+            for output in output_dir.glob("*.npy"):
+                if output.stem in sources:
+                    continue
+                output.unlink()
+                manifest.pop(output.relative_to(MFCC_ROOT).as_posix(), None)
+                removed += 1
+
+    # Entries whose output is gone as well (e.g. deleted by hand)
+    for key in [key for key in manifest if not (MFCC_ROOT / key).exists()]:
+        del manifest[key]
+    return removed
+
+def _init_worker():
+    # One process per core already; avoid every worker spawning a full torch thread pool
+    import torch
+    torch.set_num_threads(1)
+
+def build_chunk(pairs):
+    """
+    Worker entry point: featurizes a chunk of (source, output) pairs in memory
+    and writes the .npy outputs. Returns (built entries, failed sources, cache hits).
+    """
+    before = build_cache.stats()
+    features = build_cache.mfcc_batch([source for source, _ in pairs], num_workers=1)
+    after = build_cache.stats()
+    cache_hits = (after["memory_hits"] + after["disk_hits"]) - (before["memory_hits"] + before["disk_hits"])
+
+    built = []
+    failed = []
+    for (source, output), mfcc_feat in zip(pairs, features):
+        if mfcc_feat is None:
+            failed.append(str(source))
+            continue
+        try:
+            # Write under a temporary name so an interrupted build never leaves a partial .npy
+            tmp_path = output.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, mfcc_feat)
+            os.replace(tmp_path, output)
+        except OSError as e:
+            print(f"Failed to write {output}: {e}")
+            failed.append(str(source))
+            continue
 
-            print(f"Processing {split}/{class_name} -> {target_split}: {len(all_files)} files...")
+        src_stat = source.stat()
+        built.append((output.relative_to(MFCC_ROOT).as_posix(), {
+            "source": source.relative_to(RAW_ROOT).as_posix(),
+            "source_size": src_stat.st_size,
+            "source_mtime": src_stat.st_mtime,
+            "params": params_hash(),
+        }))
+    return built, failed, cache_hits
+
+def pack_shards(layout=SHARD_LAYOUT):
+    """Repacks the memory-mapped shard of every split whose .npy files changed."""
+    for split in SPLITS:
+        split_dir = MFCC_ROOT / split.split('_')[0]
+        if not split_dir.exists():
+            continue
+        index = load_shard_index(split_dir)
+        if index is not None and index["layout"] == layout:
+            continue
+        try:
+            shard_dir = pack_shard(split_dir, layout=layout)
+            print(f"Packed {split_dir.name} -> {shard_dir} ({layout})")
+        except ValueError as e:
+            print(f"Skipping shard for {split_dir.name}: {e}")
+
+def main(num_workers=NUM_WORKERS):
+    print("Starting MFCC Dataset Building...")
+    start_time = time.time()
 
-            for input_audio in all_files:
-                output_mfcc = output_dir / (input_audio.stem + ".npy")
-                
-                clean_audio = "temp.wav"
+    MFCC_ROOT.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+    current_hash = params_hash()
 
+    pruned = prune_orphans(manifest)
+    if pruned:
+        print(f"Removed {pruned} output(s) whose source recording no longer exists")
+        save_manifest(manifest)
+
+    stale, skipped = collect_tasks(manifest, current_hash)
+    total = len(stale)
+    print(f"{skipped} outputs up to date, {total} to build with {num_workers} worker(s)...")
+
+    built_count = 0
+    cache_hits = 0
+    failures = []
+    if stale:
+        chunks = [stale[i:i + CHUNK_SIZE] for i in range(0, total, CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(build_chunk, chunk): chunk for chunk in chunks}
+            done = 0
+            for future in as_completed(futures):
+                chunk = futures[future]
                 try:
-                    preprocess_audio(str(input_audio), clean_audio)
-                    extract_mfcc(clean_audio, str(output_mfcc))
+                    built, failed, hits = future.result()
                 except Exception as e:
-                    print(f"Failed to process {input_audio}: {e}")
-                finally:
-                    if os.path.exists(clean_audio):
-                        try:
-                            os.remove(clean_audio)
-                        except:
-                            pass
-
-    print("MFCC dataset built successfully")
+                    print(f"Worker failed on a chunk of {len(chunk)} files: {e}")
+                    built, failed, hits = [], [str(source) for source, _ in chunk], 0
+
+                for key, entry in built:
+                    manifest[key] = entry
+                built_count += len(built)
+                failures.extend(failed)
+                cache_hits += hits
+
+                done += len(chunk)
+                print(f"[{done}/{total}] built {built_count}, failed {len(failures)}", flush=True)
+
+                # Persist progress so an interrupted run resumes where it stopped
+                save_manifest(manifest)
+
+    save_manifest(manifest)
+    pack_shards()
+
+    print("\n--- MFCC build summary ---")
+    print(f"Built:      {built_count}")
+    print(f"Up to date: {skipped}")
+    print(f"Removed:    {pruned}")
+    print(f"Failed:     {len(failures)}")
+    print(f"Cache hits: {cache_hits}")
+    print(f"Elapsed:    {time.time() - start_time:.1f}s")
+    for source in failures:
+        print(f"  ✗ {source}")
+
+    print("MFCC dataset built successfully" if not failures else "MFCC dataset built with failures")
+    return not failures
 
 if __name__ == "__main__":
     main()
@@ -1,52 +1,217 @@
 import torch
 from torch.utils.data import Dataset, DataLoader
 import numpy as np
+import hashlib
+import json
 import os
+import time
 from pathlib import Path
 import torch.nn.functional as F
 
+SHARD_SUFFIX = ".shard"
+SHARD_DATA = "features.npy"
+SHARD_INDEX = "index.json"
+RESIZED_SIZE = (224, 224)
+
+def shard_dir_for(data_dir):
+    """Shard of a split directory, e.g. voice_mfcc/train -> voice_mfcc/train.shard"""
+    data_dir = Path(data_dir)
+    return data_dir.parent / (data_dir.name + SHARD_SUFFIX)
+
+def _list_split(data_dir):
+    classes = sorted([d.name for d in data_dir.iterdir() if d.is_dir()])
+    files, labels = [], []
+    for label, cls_name in enumerate(classes):
+        for f in sorted((data_dir / cls_name).glob("*.npy")):
+            files.append(f)
+            labels.append(label)
+    return classes, files, labels
+
+def pack_shard(data_dir, layout="raw"):
+    """
+    Packs every .npy of a split into one contiguous array plus an index.
+
+    layout="raw" stores the (3, 40, T) float32 features as they are (all samples
+    must share T, which load_audio's fixed duration guarantees). layout="resized"
+    stores the (3, 224, 224) model inputs as float16, so loading skips the resize
+    entirely at half the size of float32.
+    """
+    data_dir = Path(data_dir)
+    classes, files, labels = _list_split(data_dir)
+    if not files:
+        raise ValueError(f"No .npy files found in {data_dir}")
+
+    first = np.load(files[0], mmap_mode='r')
+    if layout == "raw":
+        sample_shape, dtype = tuple(first.shape), np.float32
+    elif layout == "resized":
+        sample_shape, dtype = (first.shape[0],) + RESIZED_SIZE, np.float16
+    else:
+        raise ValueError(f"Unknown shard layout: {layout}")
+
+    shard_dir = shard_dir_for(data_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    built_at = time.time()
+
+    # Fill a memory-mapped .npy in place; nothing is held in RAM
+    tmp_data = shard_dir / (SHARD_DATA + ".tmp")
+    data = np.lib.format.open_memmap(tmp_data, mode='w+', dtype=dtype, shape=(len(files),) + sample_shape)
+    for i, f in enumerate(files):
+        feat = np.load(f)
+        if layout == "resized":
+            feat = _resize(torch.from_numpy(feat).float()).numpy()
+        if feat.shape != sample_shape:
+            raise ValueError(f"{f} has shape {feat.shape}, expected {sample_shape}")
+        data[i] = feat
+    data.flush()
+    del data
+    os.replace(tmp_data, shard_dir / SHARD_DATA)
+
+    index = {
+        "layout": layout,
+        "classes": classes,
+        "labels": labels,
+        "files": [f.relative_to(data_dir).as_posix() for f in files],
+        "built_at": built_at,
+    }
+    with open(shard_dir / SHARD_INDEX, "w") as f:
+        json.dump(index, f)
+    return shard_dir
+
+def load_shard_index(data_dir):
+    """
+    Returns the shard index of a split if it still describes the .npy files on
+    disk (same files, none modified since packing), else None.
+    """
+    data_dir = Path(data_dir)
+    shard_dir = shard_dir_for(data_dir)
+    if not (shard_dir / SHARD_INDEX).exists() or not (shard_dir / SHARD_DATA).exists():
+        return None
+    with open(shard_dir / SHARD_INDEX) as f:
+        index = json.load(f)
+
+    _, files, _ = _list_split(data_dir)
+    if [f.relative_to(data_dir).as_posix() for f in files] != index["files"]:
+        return None
+    if any(f.stat().st_mtime > index["built_at"] for f in files):
+        return None
+    return index
+
+def _resize(mfcc_tensor):
+    # (3, 40, T) -> (3, 224, 224)
+    mfcc_tensor = mfcc_tensor.unsqueeze(0) # (1, 3, 40, T)
+    mfcc_tensor = F.interpolate(mfcc_tensor, size=RESIZED_SIZE, mode="bilinear", align_corners=False)
+    return mfcc_tensor.squeeze(0)
+
 class MFCCDataset(Dataset):
-    def __init__(self, data_dir, transform=None):
+    """
+    MFCC features of one split (one sub-directory of .npy files per class).
+
+    If the split has an up-to-date shard (see pack_shard), samples are sliced out
+    of one memory-mapped array instead of opening a file per access. With
+    resize=False items are returned as stored and MFCCCollate resizes the whole
+    batch at once. native=True always yields the stored (3, 40, T) features
+    (a "resized" shard is then bypassed) for the native-resolution model.
+    """
+    def __init__(self, data_dir, transform=None, use_shard=True, resize=True, native=False):
         self.data_dir = Path(data_dir)
-        self.files = []
-        self.labels = []
-        self.classes = sorted([d.name for d in self.data_dir.iterdir() if d.is_dir()])
+        self.resize = resize and not native
+        self.shard = None
+        self.layout = "raw"
+
+        index = load_shard_index(self.data_dir) if use_shard else None
+        if index is not None and native and index["layout"] == "resized":
+            index = None # Only holds 224x224 inputs; read the .npy files instead
+        if index is not None:
+            self.classes = index["classes"]
+            self.files = [self.data_dir / f for f in index["files"]]
+            self.labels = index["labels"]
+            self.layout = index["layout"]
+            # Copy-on-write mapping: slices are writable views, so no copies are made
+            self.shard = np.load(shard_dir_for(self.data_dir) / SHARD_DATA, mmap_mode='c')
+        else:
+            self.classes, self.files, self.labels = _list_split(self.data_dir)
         self.class_to_idx = {cls_name: i for i, cls_name in enumerate(self.classes)}
-        
-        for cls_name in self.classes:
-            cls_dir = self.data_dir / cls_name
-            for f in cls_dir.glob("*.npy"):
-                self.files.append(f)
-                self.labels.append(self.class_to_idx[cls_name])
                 
     def __len__(self):
         return len(self.files)
+
+    def fingerprint(self):
+        """Hash of the split's files, labels and mtimes (changes whenever the data does)."""
+        digest = hashlib.sha256()
+        for f, label in zip(self.files, self.labels):
+            digest.update(f"{f.relative_to(self.data_dir).as_posix()}|{label}|{os.path.getmtime(f)}\n".encode())
+        return digest.hexdigest()
         
     def __getitem__(self, idx):
-        file_path = self.files[idx]
         label = self.labels[idx]
-        
-        # Load (3, 40, T) numpy array
-        mfcc_feat = np.load(file_path)
-        mfcc_tensor = torch.from_numpy(mfcc_feat).float()
+
+        if self.shard is not None:
+            mfcc_tensor = torch.from_numpy(self.shard[idx])
+            if self.layout == "resized":
+                return mfcc_tensor.float(), label
+            mfcc_tensor = mfcc_tensor.float()
+        else:
+            # Load (3, 40, T) numpy array
+            mfcc_feat = np.load(self.files[idx])
+            mfcc_tensor = torch.from_numpy(mfcc_feat).float()
+
+        if not self.resize:
+            return mfcc_tensor, label
         
         # Internal Resize to (224, 224)
         # Shape is (3, 40, T)
-        mfcc_tensor = mfcc_tensor.unsqueeze(0) # (1, 3, 40, T)
-        mfcc_tensor = F.interpolate(mfcc_tensor, size=(224, 224), mode="bilinear", align_corners=False)
-        mfcc_tensor = mfcc_tensor.squeeze(0) # (3, 224, 224)
-        
-        return mfcc_tensor, label
+        return _resize(mfcc_tensor), label
+
+class MFCCCollate:
+    """
+    Batch-level transform: stacks the samples, resizes them to (224, 224) with one
+    F.interpolate call (samples that are already 224x224, e.g. from a resized
+    shard, are left alone; size=None never resizes) and, when mean/std are given,
+    applies (x - mean) / (std + 1e-6). mean/std may be scalars or per-channel
+    lists. The result is identical to resizing and normalizing each sample on its own.
+
+    It runs wherever the DataLoader collates, i.e. inside the worker processes
+    when num_workers > 0.
+    """
+    def __init__(self, mean=None, std=None, size=RESIZED_SIZE):
+        if isinstance(mean, (list, tuple)):
+            # Per-channel stats broadcast over (N, C, H, W)
+            mean = torch.tensor(mean).view(1, -1, 1, 1)
+            std = torch.tensor(std).view(1, -1, 1, 1)
+        self.mean = mean
+        self.std = std
+        self.size = tuple(size) if size is not None else None
+
+    def __call__(self, batch):
+        images = torch.stack([item[0] for item in batch])
+        labels = torch.tensor([item[1] for item in batch])
+
+        if self.size is not None and tuple(images.shape[-2:]) != self.size:
+            images = F.interpolate(images, size=self.size, mode="bilinear", align_corners=False)
+        if self.mean is not None:
+            images = (images - self.mean) / (self.std + 1e-6)
+        return images, labels
 
-def get_dataloader(data_dir, batch_size=16, shuffle=True):
+def get_dataloader(data_dir, batch_size=16, shuffle=True, mean=None, std=None, num_workers=0, size=RESIZED_SIZE):
+    """
+    DataLoader over a split that yields (3, 224, 224) batches, normalized with
+    mean/std when they are given. size=None yields the native (3, 40, T) features.
+    """
     if not os.path.exists(data_dir):
         print(f"Dataset directory not found: {data_dir}")
         return None, None
         
-    dataset = MFCCDataset(data_dir)
+    dataset = MFCCDataset(data_dir, resize=False, native=size is None)
     if len(dataset) == 0:
         print(f"No .npy files found in {data_dir}")
         return None, None
         
-    loader = DataLoader(dataset, batch_size=batch_size, shuffle=shuffle)
+    loader = DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        num_workers=num_workers,
+        collate_fn=MFCCCollate(mean, std, size),
+    )
     return loader, dataset.classes
@@ -0,0 +1,134 @@
+import torch
+import torch.nn.functional as F
+from torch.optim import AdamW
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+from swin_model import SwinTransformer
+from bagging_inference import ensembles
+from dataset import get_dataloader
+import os
+import sys
+from pathlib import Path
+import numpy as np
+
+# Project root, for shared ai_models helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from ai_models.distillation import measure_latency, report, train_student
+from ai_models.frozen_trunk import CACHE_FROZEN_TRUNK, TailModel, activation_loader
+
+# Hyperparameters
+BATCH_SIZE = 16
+EVAL_BATCH_SIZE = 64
+LEARNING_RATE = 3e-5
+WEIGHT_DECAY = 1e-4
+EPOCHS = 25
+TEMPERATURE = float(os.environ.get("DISTILL_TEMPERATURE", 2.0))
+ALPHA = float(os.environ.get("DISTILL_ALPHA", 0.7)) # Weight of the soft-target loss
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'voice_mfcc')
+TEACHER_FILES = ['swin_1.pth', 'swin_2.pth', 'swin_3.pth']
+STUDENT_SAVE_PATH = 'swin_student.pth'
+
+def teacher_probs(ensemble, data_dir):
+    """Averaged member probabilities for every sample of a split, in dataset order."""
+    # Un-normalized batches: the ensemble applies its own stats
+    loader, _ = get_dataloader(data_dir, batch_size=EVAL_BATCH_SIZE, shuffle=False)
+    probs, labels = [], []
+    for images, batch_labels in loader:
+        probs.append(ensemble.predict_proba(images).numpy())
+        labels.append(batch_labels.numpy())
+    return np.concatenate(probs), np.concatenate(labels)
+
+def student_probs(model, loader, device):
+    model.eval()
+    probs = []
+    with torch.no_grad():
+        for images, _ in loader:
+            probs.append(F.softmax(model(images.to(device)), dim=1).cpu().numpy())
+    return np.concatenate(probs)
+
+def distill():
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Using device: {device}", flush=True)
+
+    train_dir = os.path.join(DATA_DIR, 'train')
+    val_dir = os.path.join(DATA_DIR, 'val')
+    test_dir = os.path.join(DATA_DIR, 'test')
+    if not os.path.exists(test_dir):
+        test_dir = val_dir
+
+    ensemble = ensembles.get(TEACHER_FILES, device)
+    if ensemble is None:
+        print("❌ Error: No bag checkpoints found. Run bagging_train.py first.", flush=True)
+        return
+    # The student is trained and saved with the teacher's normalization stats
+    mean, std, classes = ensemble.mean, ensemble.std, ensemble.classes
+    print(f"Teacher: {len(ensemble)} bags, mean={mean:.4f}, std={std:.4f}", flush=True)
+
+    print("Computing ensemble soft targets on the training split...", flush=True)
+    soft_targets, _ = teacher_probs(ensemble, train_dir)
+
+    train_loader, train_classes = get_dataloader(train_dir, batch_size=BATCH_SIZE, shuffle=True, mean=mean, std=std)
+    val_loader, _ = get_dataloader(val_dir, batch_size=BATCH_SIZE, shuffle=False, mean=mean, std=std)
+    if train_loader is None or val_loader is None:
+        print("Failed to load datasets.", flush=True)
+        return
+    if list(train_classes) != list(classes):
+        print(f"❌ Error: dataset classes {train_classes} do not match the bags' {classes}.", flush=True)
+        return
+
+    print("Initializing student SwinTransformer (pretrained=True)...", flush=True)
+    student = SwinTransformer(num_classes=len(classes)).to(device)
+    net = student
+    if CACHE_FROZEN_TRUNK:
+        # Same cache layout and key as train.py, so the activations are shared
+        stats_key = f"mean={mean}|std={std}"
+        train_loader = activation_loader(
+            student, train_loader, DATA_DIR + ".trunk/train",
+            f"{train_loader.dataset.fingerprint()}|{stats_key}", device, shuffle=True
+        )
+        val_loader = activation_loader(
+            student, val_loader, DATA_DIR + ".trunk/val",
+            f"{val_loader.dataset.fingerprint()}|{stats_key}", device
+        )
+        net = TailModel(student)
+
+    optimizer = AdamW(
+        filter(lambda p: p.requires_grad, student.parameters()),
+        lr=LEARNING_RATE,
+        weight_decay=WEIGHT_DECAY
+    )
+    scheduler = ReduceLROnPlateau(optimizer, mode='max', factor=0.3, patience=3)
+
+    def save_student(model, val_acc):
+        # Same format as train.py, so the registry and inference.py load it as-is
+        torch.save({
+            'model_state_dict': student.state_dict(),
+            'mean': mean,
+            'std': std,
+            'classes': classes
+        }, STUDENT_SAVE_PATH)
+        print(f"--> Saved better student ({val_acc:.4f})", flush=True)
+
+    best = train_student(
+        net, optimizer, scheduler, train_loader.dataset, soft_targets, val_loader, device, EPOCHS,
+        save_student, batch_size=BATCH_SIZE, collate_fn=train_loader.collate_fn,
+        temperature=TEMPERATURE, alpha=ALPHA
+    )
+    print(f"Distillation complete. Best Val Acc: {best:.4f}", flush=True)
+
+    # Compare the saved (best) student with the ensemble on held-out data
+    print(f"\n--- Student vs. ensemble on {test_dir} ---", flush=True)
+    checkpoint = torch.load(STUDENT_SAVE_PATH, map_location=device)
+    student.load_state_dict(checkpoint['model_state_dict'])
+    student.eval()
+
+    ensemble_probs, labels = teacher_probs(ensemble, test_dir)
+    test_loader, _ = get_dataloader(test_dir, batch_size=EVAL_BATCH_SIZE, shuffle=False, mean=mean, std=std)
+    probs = student_probs(student, test_loader, device)
+
+    sample, _ = next(iter(get_dataloader(test_dir, batch_size=1, shuffle=False)[0]))
+    teacher_ms = measure_latency(ensemble.predict_proba, sample)
+    student_ms = measure_latency(lambda x: student(((x - mean) / (std + 1e-6)).to(device)), sample)
+    report(probs, ensemble_probs, labels, student_ms, teacher_ms, batch_size=1)
+
+if __name__ == "__main__":
+    distill()
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from preprocess_audio import load_audio, TARGET_SR, TARGET_DURATION
+from utils import compute_mfcc, compute_mfcc_batch
+
+SCRIPT_DIR = Path(__file__).parent
+CACHE_DIR = Path(os.environ.get("VOICE_FEATURE_CACHE_DIR", SCRIPT_DIR / "feature_cache"))
+MEMORY_ITEMS = int(os.environ.get("VOICE_FEATURE_CACHE_ITEMS", 256))
+
+# Feature settings the cached arrays depend on (see utils.compute_mfcc)
+DEFAULT_PARAMS = {
+    'sr': TARGET_SR,
+    'n_mfcc': 40,
+    'n_fft': 1024,
+    'hop_length': 320,
+    'duration': TARGET_DURATION,
+}
+
+# Extractor names in the cache key: librosa (compute_mfcc) and the batched torch
+# extractor (compute_mfcc_batch) agree to within tolerance, not bit for bit
+LIBROSA = 'librosa'
+TORCH = 'torch'
+
+def _read_bytes(source):
+    if hasattr(source, 'read'):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        data = source.read()
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return data
+    with open(source, 'rb') as f:
+        return f.read()
+
+class FeatureCache:
+    """
+    Two-tier cache of 3-channel MFCC arrays (MFCC, Delta, Delta2).
+
+    Entries are keyed by the SHA-256 of the raw audio bytes, the extractor
+    that computed them (mfcc() and mfcc_batch() never serve each other's
+    arrays) and the feature parameters, so re-uploads and re-scoring of the
+    same recording skip decode, trim and MFCC computation. The memory tier is
+    a bounded LRU; the disk tier keeps one .npy per key under `cache_dir`
+    (pass None to disable it).
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_items=MEMORY_ITEMS):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(audio_bytes, params=DEFAULT_PARAMS, extractor=LIBROSA):
+        digest = hashlib.sha256(audio_bytes).hexdigest()
+        settings = "_".join(f"{name}{params[name]}" for name in sorted(params))
+        return f"{digest}_{extractor}_{settings}"
+
+    def _disk_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.npy"
+
+    def _remember(self, key, features):
+        with self._lock:
+            self._memory[key] = features
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached array for `key`, or None."""
+        with self._lock:
+            features = self._memory.get(key)
+            if features is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return features
+
+        if self.cache_dir is not None:
+            path = self._disk_path(key)
+            if path.exists():
+                try:
+                    features = np.load(path)
+                except Exception as e:
+                    print(f"Warning: unreadable feature cache entry {path}: {e}")
+                else:
+                    self._remember(key, features)
+                    with self._lock:
+                        self.disk_hits += 1
+                    return features
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, features):
+        self._remember(key, features)
+        if self.cache_dir is None:
+            return
+
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp name first so readers never see a partial file
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                np.save(f, features)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: could not write feature cache entry {path}: {e}")
+
+    def mfcc(self, source, params=DEFAULT_PARAMS):
+        """
+        MFCC features of shape (3, n_mfcc, T) for a path or file-like object,
+        computed with load_audio() + compute_mfcc() on a cache miss.
+        """
+        key = self.make_key(_read_bytes(source), params, LIBROSA)
+        features = self.get(key)
+        if features is not None:
+            return features
+
+        y = load_audio(source, sr=params['sr'], target_len=params['sr'] * params['duration'])
+        features = compute_mfcc(
+            y,
+            sr=params['sr'],
+            n_mfcc=params['n_mfcc'],
+            n_fft=params['n_fft'],
+            hop_length=params['hop_length'],
+        )
+        self.put(key, features)
+        return features
+
+    def mfcc_batch(self, sources, params=DEFAULT_PARAMS, batch_size=64, num_workers=None):
+        """
+        Batched variant of mfcc(). Cache misses are decoded in a thread pool and
+        featurized together with compute_mfcc_batch() in chunks of `batch_size`.
+        Returns one (3, n_mfcc, T) array per source, or None where it failed.
+        """
+        sources = list(sources)
+        results = [None] * len(sources)
+        keys = [None] * len(sources)
+        missing = []
+
+        for i, source in enumerate(sources):
+            try:
+                keys[i] = self.make_key(_read_bytes(source), params, TORCH)
+            except Exception as e:
+                print(f"Featurization failed for {source}: {e}")
+                continue
+            results[i] = self.get(keys[i])
+            if results[i] is None:
+                missing.append(i)
+
+        def _load(i):
+            try:
+                return load_audio(sources[i], sr=params['sr'], target_len=params['sr'] * params['duration'])
+            except Exception as e:
+                print(f"Featurization failed for {sources[i]}: {e}")
+                return None
+
+        # librosa/numpy release the GIL for the heavy parts of decoding
+        workers = num_workers or min(8, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(missing), batch_size):
+                chunk = missing[start:start + batch_size]
+                waveforms = list(pool.map(_load, chunk))
+                decoded = [(i, y) for i, y in zip(chunk, waveforms) if y is not None]
+                if not decoded:
+                    continue
+
+                features = compute_mfcc_batch(
+                    [y for _, y in decoded],
+                    sr=params['sr'],
+                    n_mfcc=params['n_mfcc'],
+                    n_fft=params['n_fft'],
+                    hop_length=params['hop_length'],
+                ).numpy()
+                for (i, _), feat in zip(decoded, features):
+                    results[i] = feat
+                    self.put(keys[i], feat)
+
+        return results
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                'lookups': lookups,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_items': len(self._memory),
+            }
+
+    def clear(self):
+        """Empties the memory tier and resets the counters (the disk tier is kept)."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+# Shared by every caller in the process
+feature_cache = FeatureCache()
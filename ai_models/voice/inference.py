@@ -1,100 +1,179 @@
 import torch
-import numpy as np
 import os
 import sys
 from pathlib import Path
 import torch.nn.functional as F
 
-# Ensure current directory is in path for local imports
+# Ensure current directory (and the project root, for shared ai_models helpers) is in path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from swin_model import SwinTransformer
-from preprocess_audio import preprocess_audio
-from utils import extract_mfcc
+from ai_models.batching import MicroBatcher
+from feature_cache import feature_cache
+from model_registry import RESIZED_SIZE, registry, default_device
 
 SCRIPT_DIR = Path(__file__).parent
-MODEL_PATH = SCRIPT_DIR / 'best_model.pth'
+# best_native_model.pth (train_native.py) serves the native-resolution model;
+# the checkpoint's 'arch' decides whether features are resized
+MODEL_PATH = SCRIPT_DIR / os.environ.get("VOICE_MODEL_FILE", 'best_model.pth')
+BATCH_SIZE = 16
 
-def predict(audio_path):
+# Micro-batching of concurrent requests (see predict_batched)
+DISPATCH_MAX_BATCH_SIZE = int(os.environ.get("VOICE_DISPATCH_MAX_BATCH", 8))
+DISPATCH_MAX_WAIT_MS = float(os.environ.get("VOICE_DISPATCH_MAX_WAIT_MS", 5))
+
+def warm_up(device=None):
+    """
+    Loads the voice checkpoint into the process-wide registry ahead of the first request.
+    """
+    return registry.warm_up([MODEL_PATH], device)
+
+def featurize(audio_source, size=RESIZED_SIZE):
+    """
+    Turns a path or file-like object into the (3, 224, 224) MFCC tensor the model
+    expects (before normalization), or the native (3, 40, T) one with size=None.
+    Everything stays in memory.
+    """
+    # Standardize audio (5s, 16kHz) and extract 3-channel features (MFCC, Delta, Delta2);
+    # recordings seen before are served from the feature cache
+    mfcc_feat = feature_cache.mfcc(audio_source)
+    mfcc_tensor = torch.from_numpy(mfcc_feat).float()
+    return resize_features(mfcc_tensor.unsqueeze(0), size).squeeze(0)
+
+def resize_features(mfcc_batch, size=RESIZED_SIZE):
+    """
+    Resizes a (N, 3, 40, T) MFCC batch to the (N, 3, 224, 224) model input,
+    matching dataset.py logic. size=None (native-resolution model) keeps it as is.
+    """
+    if size is None:
+        return mfcc_batch
+    return F.interpolate(mfcc_batch, size=size, mode="bilinear", align_corners=False)
+
+def predict_features(loaded, features, batch_size=BATCH_SIZE):
+    """
+    Runs a LoadedModel over a stack of un-normalized (N, 3, H, W) features in
+    chunks of `batch_size`. Returns the dementia probability of each row.
+    """
+    dementia_probs = []
+    with torch.no_grad():
+        for start in range(0, len(features), batch_size):
+            batch = features[start:start + batch_size]
+
+            # Normalize with stored stats
+            batch = (batch - loaded.mean) / (loaded.std + 1e-6)
+            outputs = loaded.model(batch.to(loaded.device))
+            probabilities = F.softmax(outputs, dim=1)
+            dementia_probs.extend(probabilities[:, loaded.dementia_idx].cpu().tolist())
+    return dementia_probs
+
+def predict(audio_source):
     """
     Predicts whether the input audio indicates dementia using the stable Swin pipeline.
+    `audio_source` can be a file path or an open file object (e.g. an uploaded file).
     """
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    device = default_device()
     
-    # 1. Load Checkpoint
+    # 1. Fetch the resident model (loaded once per process, reloaded if the checkpoint changes)
     if not MODEL_PATH.exists():
         print(f"Error: Model file {MODEL_PATH} not found.")
         return 0.5 # Return 0.5 as neutral fallback
         
-    checkpoint = torch.load(MODEL_PATH, map_location=device)
-    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
-        model_state = checkpoint['model_state_dict']
-        mean = checkpoint.get('mean', 0.0)
-        std = checkpoint.get('std', 1.0)
-        classes = checkpoint.get('classes', ['dementia', 'healthy'])
-    else:
-        model_state = checkpoint
-        mean = 0.0
-        std = 1.0
-        classes = ['dementia', 'healthy']
-    
-    # 2. Preprocess and Generate MFCC (.npy)
-    temp_npy = SCRIPT_DIR / "temp_inference.npy"
-    temp_wav = SCRIPT_DIR / "temp_inference.wav"
+    loaded = registry.get(MODEL_PATH, device)
     
     try:
-        # Standardize audio (5s, 16kHz)
-        preprocess_audio(audio_path, str(temp_wav))
-        
-        # Extract 3-channel features (MFCC, Delta, Delta2)
-        extract_mfcc(str(temp_wav), str(temp_npy.with_suffix(""))) # extract_mfcc appends .npy
-        
-        # Load and Prepare Tensor
-        mfcc_feat = np.load(str(temp_npy))
-        mfcc_tensor = torch.from_numpy(mfcc_feat).float()
+        # 2. Preprocess and generate MFCC features in memory
+        mfcc_tensor = featurize(audio_source, loaded.input_size).unsqueeze(0) # (1, 3, 224, 224) or (1, 3, 40, T)
         
-        # Resize to (224, 224) matching dataset.py logic
-        mfcc_tensor = mfcc_tensor.unsqueeze(0) # (1, 3, 40, T)
-        mfcc_tensor = F.interpolate(mfcc_tensor, size=(224, 224), mode="bilinear", align_corners=False)
-        
-        # Normalize with stored stats
-        mfcc_tensor = (mfcc_tensor - mean) / (std + 1e-6)
-        mfcc_tensor = mfcc_tensor.to(device)
-        
-        # 3. Load Model
-        model = SwinTransformer(num_classes=len(classes), pretrained=False)
-        model.load_state_dict(model_state)
-        model.to(device)
-        model.eval()
-        
-        # 4. Inference
-        with torch.no_grad():
-            outputs = model(mfcc_tensor)
-            probabilities = torch.nn.functional.softmax(outputs, dim=1)
-            
-        # Get index for 'dementia' class
-        try:
-            dementia_idx = classes.index('dementia')
-        except ValueError:
-            dementia_idx = 0 # Fallback
-            
-        dementia_prob = probabilities[0][dementia_idx].item()
-        return dementia_prob
+        # 3. Inference
+        return predict_features(loaded, mfcc_tensor)[0]
 
     except Exception as e:
         print(f"Inference failed: {e}")
         return 0.5
-    finally:
-        # Cleanup
-        if temp_npy.exists():
-            os.remove(temp_npy)
-        if temp_wav.exists():
-            os.remove(temp_wav)
+
+def predict_batch(audio_sources, batch_size=BATCH_SIZE, num_workers=None):
+    """
+    Scores many recordings at once. Inputs (paths or file objects) are decoded in
+    parallel, featurized together with the batched torch MFCC extractor (cached
+    recordings are reused), stacked into one tensor and run through the model in
+    chunks of `batch_size`.
+    Returns one dementia probability per input, in input order. Inputs that fail
+    to decode get the same neutral 0.5 fallback as predict().
+    """
+    audio_sources = list(audio_sources)
+    results = [0.5] * len(audio_sources)
+    if not audio_sources:
+        return results
+
+    if not MODEL_PATH.exists():
+        print(f"Error: Model file {MODEL_PATH} not found.")
+        return results
+
+    loaded = registry.get(MODEL_PATH, default_device())
+
+    # 1. Parallel decode + batched MFCC for everything not already cached
+    features = feature_cache.mfcc_batch(audio_sources, num_workers=num_workers)
+
+    valid_idx = [i for i, feat in enumerate(features) if feat is not None]
+    if not valid_idx:
+        return results
+
+    # 2. One stacked tensor, batched resize and forward passes
+    try:
+        stacked = resize_features(
+            torch.stack([torch.from_numpy(features[i]).float() for i in valid_idx]), loaded.input_size
+        )
+        dementia_probs = predict_features(loaded, stacked, batch_size=batch_size)
+    except Exception as e:
+        print(f"Batch inference failed: {e}")
+        return results
+
+    for i, prob in zip(valid_idx, dementia_probs):
+        results[i] = prob
+    return results
+
+def _score_feature_batch(features):
+    loaded = registry.get(MODEL_PATH, default_device())
+    return predict_features(loaded, torch.stack(features), batch_size=len(features))
+
+_dispatcher = MicroBatcher(
+    _score_feature_batch,
+    max_batch_size=DISPATCH_MAX_BATCH_SIZE,
+    max_wait_ms=DISPATCH_MAX_WAIT_MS,
+    name="voice-dispatcher",
+)
+
+def predict_batched(audio_source, raise_errors=False):
+    """
+    Same contract as predict(), but the forward pass is coalesced with other
+    concurrent callers into one batch. Featurization still runs in the caller's
+    thread, so only the model call is shared.
+    With raise_errors=True a missing model or failed inference raises instead
+    of returning the neutral 0.5 (used by the async jobs, which record the error).
+    """
+    if not MODEL_PATH.exists():
+        if raise_errors:
+            raise FileNotFoundError(f"Model file {MODEL_PATH} not found.")
+        print(f"Error: Model file {MODEL_PATH} not found.")
+        return 0.5
+
+    try:
+        input_size = registry.get(MODEL_PATH, default_device()).input_size
+        return _dispatcher(featurize(audio_source, input_size))
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Inference failed: {e}")
+        return 0.5
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
+    if len(sys.argv) == 2:
         file_path = sys.argv[1]
         prob = predict(file_path)
         print(f"Dementia Probability: {prob:.4f}")
+    elif len(sys.argv) > 2:
+        file_paths = sys.argv[1:]
+        for file_path, prob in zip(file_paths, predict_batch(file_paths)):
+            print(f"{file_path}: Dementia Probability: {prob:.4f}")
     else:
-        print("Usage: python inference.py <path_to_audio_file>")
+        print("Usage: python inference.py <path_to_audio_file> [more_audio_files...]")
@@ -0,0 +1,199 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
+import torch
+
+# Project root, for shared ai_models helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from ai_models.onnx_backend import load_onnx, use_onnx
+from ai_models.quantization import maybe_quantize
+from ai_models.shared_weights import build_shared, use_shared_weights
+
+DEFAULT_CLASSES = ['dementia', 'healthy']
+# Model families a checkpoint's 'arch' entry can name (missing = Swin)
+ARCH_SWIN = 'swin'
+ARCH_NATIVE = 'native'
+RESIZED_SIZE = (224, 224)
+
+
+def default_device():
+    return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+
+class LoadedModel:
+    """
+    A checkpoint that has been built into an eval-mode model, together with the
+    normalization stats and class list it was trained with.
+    """
+    def __init__(self, model, mean, std, classes, path, mtime, device, quantized=False, backend='torch',
+                 arch=ARCH_SWIN, shared=False):
+        self.model = model
+        self.mean = mean
+        self.std = std
+        self.classes = classes
+        self.path = path
+        self.mtime = mtime
+        self.device = device
+        self.quantized = quantized
+        self.backend = backend
+        self.arch = arch
+        self.shared = shared
+
+    @property
+    def input_size(self):
+        """Spatial size the features are resized to, or None for native (40, T) input."""
+        return None if self.arch == ARCH_NATIVE else RESIZED_SIZE
+
+    @property
+    def dementia_idx(self):
+        try:
+            return self.classes.index('dementia')
+        except ValueError:
+            return 0 # Fallback
+
+
+def load_checkpoint(path, device):
+    """
+    Reads a voice checkpoint and returns (model_state, mean, std, classes, arch).
+    Accepts both the dict format saved by train.py and a bare state_dict.
+    """
+    checkpoint = torch.load(path, map_location=device)
+    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+        return (
+            checkpoint['model_state_dict'],
+            checkpoint.get('mean', 0.0),
+            checkpoint.get('std', 1.0),
+            checkpoint.get('classes', DEFAULT_CLASSES),
+            checkpoint.get('arch', ARCH_SWIN),
+        )
+    return checkpoint, 0.0, 1.0, DEFAULT_CLASSES, ARCH_SWIN
+
+
+def create_architecture(arch, num_classes, pretrained=False):
+    """Un-trained model of the given family (imports only what that family needs)."""
+    if arch == ARCH_NATIVE:
+        from native_model import NativeMFCCNet
+        return NativeMFCCNet(num_classes=num_classes)
+    if arch == ARCH_SWIN:
+        from swin_model import SwinTransformer # timm is only needed for Swin
+        return SwinTransformer(num_classes=num_classes, pretrained=pretrained)
+    raise ValueError(f"Unknown voice model architecture: {arch}")
+
+
+def build_model(path, device, mtime=None):
+    if mtime is None:
+        mtime = os.path.getmtime(path)
+
+    if use_onnx():
+        # INFERENCE_BACKEND=onnx: the exported graph and its metadata replace the
+        # checkpoint; without an up-to-date export we fall back to eager torch
+        model, meta = load_onnx(path)
+        if model is not None:
+            return LoadedModel(
+                model, meta['mean'], meta['std'], meta['classes'], path, mtime,
+                torch.device('cpu'), backend='onnx', arch=meta.get('arch', ARCH_SWIN)
+            )
+
+    if use_shared_weights(device):
+        # SHARED_WEIGHTS=1: parameters are read-only views of a memory map that
+        # every worker process shares (falls back to a private copy without one)
+        model, meta = build_shared(
+            lambda meta: create_architecture(meta.get('arch', ARCH_SWIN), len(meta['classes'])), path
+        )
+        if model is not None:
+            # A quantized model is a private (but 4x smaller) copy
+            model, quantized = maybe_quantize(model, path, device)
+            return LoadedModel(
+                model, meta['mean'], meta['std'], meta['classes'], path, mtime, device, quantized,
+                arch=meta.get('arch', ARCH_SWIN), shared=not quantized
+            )
+
+    model_state, mean, std, classes, arch = load_checkpoint(path, device)
+
+    # Weights come from the checkpoint, so there is no point fetching pretrained ones
+    model = create_architecture(arch, len(classes), pretrained=False)
+    model.load_state_dict(model_state)
+    model.to(device)
+    model.eval()
+    # INT8 Linear layers when QUANTIZE_INFERENCE=1 and the checkpoint passed the gate
+    model, quantized = maybe_quantize(model, path, device)
+    return LoadedModel(model, mean, std, classes, path, mtime, device, quantized, arch=arch)
+
+
+class ModelRegistry:
+    """
+    Process-resident cache of voice models.
+
+    Each checkpoint is loaded at most once per process and device. Entries are
+    keyed by the resolved checkpoint path and remember the file mtime they were
+    built from, so overwriting a checkpoint (e.g. after retraining) transparently
+    triggers a reload on the next get().
+    """
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(path, device):
+        return str(Path(path).resolve()), str(device)
+
+    def get(self, path, device=None):
+        """
+        Returns the LoadedModel for `path`, building it on first use or when the
+        file on disk has changed since it was loaded.
+        """
+        device = torch.device(device) if device is not None else default_device()
+        key = self._key(path, device)
+        mtime = os.path.getmtime(key[0])
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.mtime != mtime:
+                entry = build_model(key[0], device, mtime)
+                self._entries[key] = entry
+            return entry
+
+    def warm_up(self, paths, device=None):
+        """
+        Eagerly loads the given checkpoints so the first request does not pay for
+        model construction. Missing files are reported and skipped.
+        """
+        loaded = []
+        for path in paths:
+            if not os.path.exists(path):
+                print(f"Warning: Model file {path} not found. Skipping warm-up.")
+                continue
+            loaded.append(self.get(path, device))
+        return loaded
+
+    def evict(self, path=None):
+        """
+        Drops cached models for `path` (on every device), or everything when no
+        path is given. Returns the number of evicted entries.
+        """
+        with self._lock:
+            if path is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+
+            resolved = str(Path(path).resolve())
+            keys = [key for key in self._entries if key[0] == resolved]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def reload(self, path, device=None):
+        """Forces a fresh load of `path`, even if its mtime has not changed."""
+        self.evict(path)
+        return self.get(path, device)
+
+    def loaded_paths(self):
+        with self._lock:
+            return sorted({key[0] for key in self._entries})
+
+
+# Shared by every caller in the process
+registry = ModelRegistry()
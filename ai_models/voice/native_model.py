@@ -0,0 +1,66 @@
+import torch
+import torch.nn as nn
+
+N_MFCC = 40
+# Frames of a standardized recording: 1 + TARGET_SR * TARGET_DURATION // hop_length (5s, 16kHz, hop 320)
+NATIVE_FRAMES = 251
+
+def _conv_block(in_channels, out_channels):
+    return nn.Sequential(
+        nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1, bias=False),
+        nn.BatchNorm2d(out_channels),
+        nn.GELU(),
+        nn.MaxPool2d(2),
+    )
+
+class NativeMFCCNet(nn.Module):
+    """
+    Compact classifier for native-resolution (3, n_mfcc, T) MFCC stacks.
+
+    Two conv blocks (each halving frequency and time) turn the input into one
+    token per 4 frames, a small transformer encoder mixes them over time and
+    the mean token feeds the head. Works on any T, so recordings are never
+    stretched to 224x224; a forward pass costs roughly 20x fewer FLOPs than
+    swin_tiny_patch4_window7_224 on the resized input.
+    """
+    def __init__(self, num_classes=2, n_mfcc=N_MFCC, channels=64, dim=128, depth=2, heads=4, dropout=0.1):
+        super(NativeMFCCNet, self).__init__()
+        self.stem = nn.Sequential(
+            _conv_block(3, channels),
+            _conv_block(channels, channels * 2),
+        )
+        self.proj = nn.Linear(channels * 2 * (n_mfcc // 4), dim)
+        layer = nn.TransformerEncoderLayer(
+            dim, heads, dim_feedforward=dim * 2, dropout=dropout, activation='gelu', batch_first=True
+        )
+        # No nested tensors: there is no padding mask, and the dense path is the one ONNX export traces
+        self.encoder = nn.TransformerEncoder(layer, depth, enable_nested_tensor=False)
+        self.norm = nn.LayerNorm(dim)
+        self.head = nn.Linear(dim, num_classes)
+
+    def forward(self, x):
+        x = self.stem(x)                     # (N, C, F/4, T/4)
+        x = x.flatten(1, 2).transpose(1, 2)  # (N, T/4, C * F/4): one token per time step
+        x = self.encoder(self.proj(x))
+        return self.head(self.norm(x.mean(dim=1)))
+
+def count_flops(model, input_shape):
+    """FLOPs of one forward pass on a single (C, H, W) input."""
+    from torch.utils.flop_counter import FlopCounterMode
+
+    model.eval()
+    counter = FlopCounterMode(display=False)
+    with torch.no_grad(), counter:
+        model(torch.randn(1, *input_shape))
+    return counter.get_total_flops()
+
+if __name__ == "__main__":
+    from swin_model import SwinTransformer
+
+    native = NativeMFCCNet()
+    swin = SwinTransformer(pretrained=False)
+    native_flops = count_flops(native, (3, N_MFCC, NATIVE_FRAMES))
+    swin_flops = count_flops(swin, (3, 224, 224))
+    print(f"NativeMFCCNet: {sum(p.numel() for p in native.parameters()) / 1e6:.2f}M params, {native_flops / 1e9:.2f} GFLOPs")
+    print(f"Swin-Tiny:     {sum(p.numel() for p in swin.parameters()) / 1e6:.2f}M params, {swin_flops / 1e9:.2f} GFLOPs")
+    print(f"Output shape: {native(torch.randn(2, 3, N_MFCC, NATIVE_FRAMES)).shape}")
@@ -1,3 +1,4 @@
+import io
 import librosa
 import soundfile as sf
 import os
@@ -7,19 +8,44 @@ TARGET_SR = 16000
 TARGET_DURATION = 5 # seconds
 TARGET_LEN = TARGET_SR * TARGET_DURATION
 
+def _decode(source, sr):
+    if not hasattr(source, 'read'):
+        return librosa.load(source, sr=sr)
+
+    # File-like input (e.g. a Django upload): decode from an in-memory copy
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    buffer = io.BytesIO(source.read())
+    try:
+        return librosa.load(buffer, sr=sr)
+    except Exception:
+        # libsndfile cannot decode every container (e.g. browser webm). Those go
+        # through audioread, which only accepts paths, so use the stored file if any.
+        path = getattr(source, 'path', None)
+        if path is None:
+            raise
+        return librosa.load(path, sr=sr)
+
+def load_audio(source, sr=TARGET_SR, target_len=TARGET_LEN):
+    """
+    Decodes a path or file-like object, trims silence and pads/truncates it to
+    `target_len` samples. Returns the standardized waveform without touching disk.
+    """
+    y, _ = _decode(source, sr)
+
+    # Trim silence
+    y, _ = librosa.effects.trim(y)
+
+    # Enforce duration (pad or truncate)
+    if len(y) < target_len:
+        y = np.pad(y, (0, target_len - len(y)))
+    else:
+        y = y[:target_len]
+    return y
+
 def preprocess_audio(input_path, output_path):
     try:
-        y, sr = librosa.load(input_path, sr=TARGET_SR)
-        
-        # Trim silence
-        y, _ = librosa.effects.trim(y)
-        
-        # Enforce duration (pad or truncate)
-        if len(y) < TARGET_LEN:
-            y = np.pad(y, (0, TARGET_LEN - len(y)))
-        else:
-            y = y[:TARGET_LEN]
-            
+        y = load_audio(input_path)
         sf.write(output_path, y, TARGET_SR)
     except Exception as e:
         print(f"Error preprocessing {input_path}: {e}")
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+from model_registry import ARCH_NATIVE, RESIZED_SIZE, create_architecture, load_checkpoint
+from dataset import get_dataloader
+
+# Project root, for shared ai_models helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from ai_models.quantization import MIN_AGREEMENT, gate
+
+EVAL_BATCH_SIZE = 64
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'voice_mfcc')
+SCRIPT_DIR = Path(__file__).parent
+DEFAULT_CHECKPOINTS = [SCRIPT_DIR / 'best_model.pth'] + [SCRIPT_DIR / f'swin_{k}.pth' for k in (1, 2, 3)]
+
+def check(checkpoint_path, split='test', min_agreement=MIN_AGREEMENT):
+    """Runs the INT8 accuracy gate for one voice checkpoint. Returns True when published."""
+    print(f"\n--- {checkpoint_path} ---")
+    model_state, mean, std, classes, arch = load_checkpoint(checkpoint_path, 'cpu')
+    model = create_architecture(arch, len(classes))
+    model.load_state_dict(model_state)
+
+    # Normalized with the checkpoint's own stats, as at inference time
+    loader, _ = get_dataloader(
+        os.path.join(DATA_DIR, split), batch_size=EVAL_BATCH_SIZE, shuffle=False, mean=mean, std=std,
+        size=None if arch == ARCH_NATIVE else RESIZED_SIZE
+    )
+    if loader is None:
+        return False
+    return gate(model, loader, checkpoint_path, min_agreement)["approved"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish INT8 voice models that agree with fp32 on the test split")
+    parser.add_argument('checkpoints', nargs='*', help="defaults to best_model.pth and the bag checkpoints")
+    parser.add_argument('--split', default='test', choices=['val', 'test'])
+    parser.add_argument('--min-agreement', type=float, default=MIN_AGREEMENT)
+    args = parser.parse_args()
+
+    paths = args.checkpoints or [str(p) for p in DEFAULT_CHECKPOINTS if p.exists()]
+    if not paths:
+        print("❌ Error: No voice checkpoints found.")
+        sys.exit(1)
+    results = [check(path, args.split, args.min_agreement) for path in paths]
+    sys.exit(0 if all(results) else 1)
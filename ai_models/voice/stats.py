@@ -0,0 +1,159 @@
+import json
+import os
+from pathlib import Path
+
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from dataset import MFCCDataset, MFCCCollate, RESIZED_SIZE
+
+STATS_SUFFIX = ".stats.json"
+
+class RunningStats:
+    """
+    Streaming mean/std (Welford's algorithm with Chan's parallel update).
+
+    Batches are folded in one at a time, so memory stays constant no matter how
+    large the dataset is. Accumulators built on separate workers or file subsets
+    can be combined with merge(). With per_channel=True statistics are kept per
+    channel (dim 1 of the batch) instead of over every element.
+
+    std uses the unbiased (n - 1) estimator, like torch.Tensor.std().
+    """
+    def __init__(self, per_channel=False):
+        self.per_channel = per_channel
+        self.count = 0
+        self._mean = None
+        self._m2 = None
+
+    def _combine(self, count, mean, m2):
+        if self.count == 0:
+            self.count, self._mean, self._m2 = count, mean, m2
+            return
+        total = self.count + count
+        delta = mean - self._mean
+        self._mean = self._mean + delta * (count / total)
+        self._m2 = self._m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def update(self, batch):
+        """Adds a (N, C, ...) batch."""
+        batch = batch.detach().to(torch.float64)
+        if self.per_channel:
+            values = batch.transpose(0, 1).reshape(batch.shape[1], -1) # (C, N * H * W)
+            count = values.shape[1]
+            mean = values.mean(dim=1)
+            m2 = ((values - mean[:, None]) ** 2).sum(dim=1)
+        else:
+            values = batch.reshape(-1)
+            count = values.numel()
+            mean = values.mean()
+            m2 = ((values - mean) ** 2).sum()
+        if count:
+            self._combine(count, mean.cpu(), m2.cpu())
+        return self
+
+    def merge(self, other):
+        """Folds in the statistics of another accumulator (e.g. from a parallel worker)."""
+        if other.per_channel != self.per_channel:
+            raise ValueError("Cannot merge per-channel and global statistics.")
+        if other.count:
+            self._combine(other.count, other._mean.clone(), other._m2.clone())
+        return self
+
+    @property
+    def mean(self):
+        if self.count == 0:
+            raise ValueError("No data has been added.")
+        return self._mean.tolist() if self.per_channel else self._mean.item()
+
+    @property
+    def std(self):
+        if self.count < 2:
+            raise ValueError("At least two values are needed for std.")
+        std = torch.sqrt(self._m2 / (self.count - 1))
+        return std.tolist() if self.per_channel else std.item()
+
+    def state_dict(self):
+        return {
+            'per_channel': self.per_channel,
+            'count': self.count,
+            'mean': None if self._mean is None else self._mean.tolist(),
+            'm2': None if self._m2 is None else self._m2.tolist(),
+        }
+
+    @classmethod
+    def from_state_dict(cls, state):
+        stats = cls(per_channel=state['per_channel'])
+        stats.count = state['count']
+        if state['mean'] is not None:
+            stats._mean = torch.tensor(state['mean'], dtype=torch.float64)
+            stats._m2 = torch.tensor(state['m2'], dtype=torch.float64)
+        return stats
+
+def stats_path_for(data_dir, native=False):
+    """Stats cache of a split directory, e.g. voice_mfcc/train -> voice_mfcc/train.stats.json"""
+    data_dir = Path(data_dir)
+    return data_dir.parent / (data_dir.name + (".native" if native else "") + STATS_SUFFIX)
+
+def accumulate(loader, stats=None, per_channel=False, log_every=10):
+    """Streams un-normalized batches from `loader` into a RunningStats."""
+    stats = stats or RunningStats(per_channel=per_channel)
+    for i, (images, _) in enumerate(loader):
+        if log_every and i % log_every == 0:
+            print(f"Stats batch {i}...", flush=True)
+        stats.update(images)
+    return stats
+
+def dataset_stats(data_dir, batch_size=16, per_channel=False, num_workers=0, native=False):
+    """
+    Mean/std of the resized (3, 224, 224) inputs of a split (of the stored
+    (3, 40, T) features with native=True), cached next to it.
+
+    The cache records which .npy files (and mtimes) it covers. When files are only
+    added, just the new ones are streamed and merged into the stored accumulator;
+    if files were removed or modified, everything is recomputed. An empty split
+    raises ValueError naming `data_dir`.
+    """
+    data_dir = Path(data_dir)
+    dataset = MFCCDataset(data_dir, resize=False, native=native)
+    current = {f.relative_to(data_dir).as_posix(): os.path.getmtime(f) for f in dataset.files}
+
+    cache_path = stats_path_for(data_dir, native)
+    stats, covered = None, {}
+    if cache_path.exists():
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached['stats']['per_channel'] == per_channel:
+                stats = RunningStats.from_state_dict(cached['stats'])
+                covered = cached['files']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: ignoring unreadable stats cache {cache_path}: {e}")
+
+    # Anything removed or changed invalidates the accumulator
+    if stats is None or any(current.get(name) != mtime for name, mtime in covered.items()):
+        stats, covered = RunningStats(per_channel=per_channel), {}
+
+    new_idx = [i for i, f in enumerate(dataset.files) if f.relative_to(data_dir).as_posix() not in covered]
+    if new_idx:
+        print(f"Updating dataset stats with {len(new_idx)} new file(s)...", flush=True)
+        loader = DataLoader(
+            Subset(dataset, new_idx),
+            batch_size=batch_size,
+            shuffle=False,
+            num_workers=num_workers,
+            collate_fn=MFCCCollate(size=None if native else RESIZED_SIZE), # Resize only
+        )
+        accumulate(loader, stats)
+
+    if stats.count == 0:
+        raise ValueError(f"No MFCC features found in {data_dir}; cannot compute dataset stats of an empty split.")
+
+    if new_idx:
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'stats': stats.state_dict(), 'files': current}, f)
+        os.replace(tmp_path, cache_path)
+
+    return stats
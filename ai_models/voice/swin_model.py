@@ -1,16 +1,19 @@
+import sys
+from pathlib import Path
+
 import torch
 import torch.nn as nn
-import timm
+
+# Project root, for shared ai_models helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from ai_models.model_factory import create_swin
 
 class SwinTransformer(nn.Module):
     def __init__(self, num_classes=2, pretrained=True):
         super(SwinTransformer, self).__init__()
-        # Load pretrained Swin Transformer tiny_patch4_window7_224
-        self.model = timm.create_model(
-            "swin_tiny_patch4_window7_224",
-            pretrained=pretrained,
-            num_classes=num_classes
-        )
+        # Swin Transformer tiny_patch4_window7_224; pretrained weights come from the
+        # local cache (see model_factory.py), pretrained=False never hits the network
+        self.model = create_swin(num_classes, pretrained=pretrained)
         
         # Freeze early layers: layers.0 and layers.1 (Step 5)
         # We keep layers.2 and layers.3 trainable
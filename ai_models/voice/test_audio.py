@@ -33,14 +33,16 @@ def test():
 
     # Load Test Data
     print(f"Loading test data from: {DATA_DIR}")
-    test_loader, _ = get_dataloader(DATA_DIR, batch_size=BATCH_SIZE, shuffle=False)
+    # Resize + normalization with the checkpoint's stats happen per batch (MFCCCollate)
+    test_loader, _ = get_dataloader(DATA_DIR, batch_size=BATCH_SIZE, shuffle=False, mean=mean, std=std)
     
     if test_loader is None:
         print("Failed to load test dataset.")
         return
 
     # Initialize Model
-    model = SwinTransformer(num_classes=len(classes)).to(device)
+    # Weights come from the checkpoint, so skip the pretrained backbone
+    model = SwinTransformer(num_classes=len(classes), pretrained=False).to(device)
     model.load_state_dict(model_state)
     model.eval()
     
@@ -50,8 +52,6 @@ def test():
     print("Starting evaluation...")
     with torch.no_grad():
         for images, labels in test_loader:
-            # Apply normalization stored in checkpoint
-            images = (images - mean) / (std + 1e-6)
             images, labels = images.to(device), labels.to(device)
             outputs = model(images)
             _, predicted = torch.max(outputs.data, 1)
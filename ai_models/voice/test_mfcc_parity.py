@@ -0,0 +1,46 @@
+import numpy as np
+import torch
+
+from preprocess_audio import TARGET_SR, TARGET_LEN
+from utils import compute_mfcc, compute_mfcc_batch
+
+# float32 STFT/log differences only; MFCC values are in the tens to hundreds
+ATOL = 1e-2
+RTOL = 1e-3
+
+def make_waveforms(n=4, seed=0):
+    """Synthetic 5s clips: a few harmonics plus noise, with a silent tail on some."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(TARGET_LEN) / TARGET_SR
+    waveforms = []
+    for i in range(n):
+        f0 = 110 + 40 * i
+        y = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 4))
+        y = 0.3 * y + 0.05 * rng.standard_normal(TARGET_LEN)
+        if i % 2:
+            y[TARGET_LEN // 2:] = 0.0 # Padded recording
+        waveforms.append(y.astype(np.float32))
+    return waveforms
+
+def test_mfcc_parity():
+    waveforms = make_waveforms()
+    expected = np.stack([compute_mfcc(y, sr=TARGET_SR) for y in waveforms])
+    actual = compute_mfcc_batch(np.stack(waveforms), sr=TARGET_SR).numpy()
+
+    assert actual.shape == expected.shape, (actual.shape, expected.shape)
+    for channel, name in enumerate(["mfcc", "delta", "delta2"]):
+        max_err = np.abs(actual[:, channel] - expected[:, channel]).max()
+        print(f"{name:<7} max abs error: {max_err:.2e}")
+        assert np.allclose(actual[:, channel], expected[:, channel], atol=ATOL, rtol=RTOL), name
+
+def test_mfcc_batch_matches_single():
+    waveforms = make_waveforms(n=3, seed=1)
+    batched = compute_mfcc_batch(waveforms, sr=TARGET_SR)
+    for i, y in enumerate(waveforms):
+        single = compute_mfcc_batch(y[None], sr=TARGET_SR)[0]
+        assert torch.allclose(batched[i], single, atol=1e-4), i
+
+if __name__ == "__main__":
+    test_mfcc_parity()
+    test_mfcc_batch_matches_single()
+    print("✔ Torch MFCC matches librosa within tolerance.")
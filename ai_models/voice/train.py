@@ -1,10 +1,17 @@
 import torch
 import torch.nn as nn
+import sys
+from pathlib import Path
 from torch.optim import AdamW
 from torch.optim.lr_scheduler import ReduceLROnPlateau
 from swin_model import SwinTransformer
 from dataset import get_dataloader
+from stats import dataset_stats
 import os
+
+# Project root, for shared ai_models helpers
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from ai_models.frozen_trunk import CACHE_FROZEN_TRUNK, TailModel, activation_loader
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import numpy as np
 
@@ -16,20 +23,7 @@ EPOCHS = 25
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'voice_mfcc')
 MODEL_SAVE_PATH = 'best_model.pth'
 
-def compute_dataset_stats(loader):
-    print("Computing training dataset mean/std...", flush=True)
-    all_data = []
-    for i, (images, _) in enumerate(loader):
-        if i % 10 == 0:
-            print(f"Stats batch {i}...", flush=True)
-        all_data.append(images)
-    all_data = torch.cat(all_data, dim=0)
-    mean = all_data.mean().item()
-    std = all_data.std().item()
-    print(f"Dataset stats: mean={mean:.4f}, std={std:.4f}", flush=True)
-    return mean, std
-
-def evaluate(model, loader, device, mean, std):
+def evaluate(model, loader, device):
     model.eval()
     all_preds = []
     all_labels = []
@@ -37,8 +31,7 @@ def evaluate(model, loader, device, mean, std):
     print("Evaluating...", flush=True)
     with torch.no_grad():
         for images, labels in loader:
-            # Normalize
-            images = (images - mean) / (std + 1e-6)
+            # Batches arrive resized and normalized (MFCCCollate)
             images, labels = images.to(device), labels.to(device)
             outputs = model(images)
             _, predicted = torch.max(outputs.data, 1)
@@ -61,20 +54,42 @@ def train():
     val_dir = os.path.join(DATA_DIR, 'val')
     
     print(f"Loading datasets from {train_dir} and {val_dir}...", flush=True)
-    train_loader, classes = get_dataloader(train_dir, batch_size=BATCH_SIZE, shuffle=True)
-    val_loader, _ = get_dataloader(val_dir, batch_size=BATCH_SIZE, shuffle=False)
-    
-    if train_loader is None or val_loader is None:
+    if not os.path.exists(train_dir) or not os.path.exists(val_dir):
         print("Failed to load datasets.", flush=True)
         return
 
-    # Compute normalization stats from train set
-    mean, std = compute_dataset_stats(train_loader)
+    # Compute normalization stats from train set (streamed, and only new files
+    # are read when the split has grown since the last run)
+    stats = dataset_stats(train_dir, batch_size=BATCH_SIZE)
+    mean, std = stats.mean, stats.std
+    print(f"Dataset stats: mean={mean:.4f}, std={std:.4f}", flush=True)
+
+    # Resize + normalization happen once per batch in the collate stage
+    train_loader, classes = get_dataloader(train_dir, batch_size=BATCH_SIZE, shuffle=True, mean=mean, std=std)
+    val_loader, _ = get_dataloader(val_dir, batch_size=BATCH_SIZE, shuffle=False, mean=mean, std=std)
+
+    if train_loader is None or val_loader is None:
+        print("Failed to load datasets.", flush=True)
+        return
 
     # Initialize Model
     print("Initializing SwinTransformer Model (pretrained=True)...", flush=True)
     model = SwinTransformer(num_classes=len(classes)).to(device)
     print("Model ready.", flush=True)
+
+    net = model
+    if CACHE_FROZEN_TRUNK:
+        # Inputs are normalized in the loader, so the stats are part of the cache key
+        stats_key = f"mean={mean}|std={std}"
+        train_loader = activation_loader(
+            model, train_loader, DATA_DIR + ".trunk/train",
+            f"{train_loader.dataset.fingerprint()}|{stats_key}", device, shuffle=True
+        )
+        val_loader = activation_loader(
+            model, val_loader, DATA_DIR + ".trunk/val",
+            f"{val_loader.dataset.fingerprint()}|{stats_key}", device
+        )
+        net = TailModel(model)
     
     criterion = nn.CrossEntropyLoss()
     
@@ -92,16 +107,14 @@ def train():
 
     print("Starting training loop...", flush=True)
     for epoch in range(EPOCHS):
-        model.train()
+        net.train()
         running_loss = 0.0
         
         for i, (images, labels) in enumerate(train_loader):
-            # Normalize
-            images = (images - mean) / (std + 1e-6)
             images, labels = images.to(device), labels.to(device)
             
             optimizer.zero_grad()
-            outputs = model(images)
+            outputs = net(images)
             loss = criterion(outputs, labels)
             loss.backward()
             optimizer.step()
@@ -113,7 +126,7 @@ def train():
         epoch_loss = running_loss / len(train_loader)
         
         # Validation
-        val_acc, val_p, val_r, val_f1 = evaluate(model, val_loader, device, mean, std)
+        val_acc, val_p, val_r, val_f1 = evaluate(net, val_loader, device)
         
         scheduler.step(val_acc)
         
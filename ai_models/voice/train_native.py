@@ -0,0 +1,92 @@
+import torch
+import torch.nn as nn
+from torch.optim import AdamW
+from torch.optim.lr_scheduler import ReduceLROnPlateau
+from native_model import NativeMFCCNet, count_flops
+from dataset import get_dataloader
+from stats import dataset_stats
+from train import evaluate
+import os
+
+# Hyperparameters (trained from scratch, so a larger LR than the fine-tuned Swin)
+BATCH_SIZE = 32
+LEARNING_RATE = 1e-3
+WEIGHT_DECAY = 1e-4
+EPOCHS = 40
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'voice_mfcc')
+MODEL_SAVE_PATH = 'best_native_model.pth'
+
+def train():
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Using device: {device}", flush=True)
+
+    train_dir = os.path.join(DATA_DIR, 'train')
+    val_dir = os.path.join(DATA_DIR, 'val')
+    if not os.path.exists(train_dir) or not os.path.exists(val_dir):
+        print("Failed to load datasets.", flush=True)
+        return
+
+    # Stats of the native (3, 40, T) features, cached separately from the resized ones
+    print("Computing training dataset mean/std...", flush=True)
+    stats = dataset_stats(train_dir, batch_size=BATCH_SIZE, native=True)
+    mean, std = stats.mean, stats.std
+    print(f"Dataset stats: mean={mean:.4f}, std={std:.4f}", flush=True)
+
+    # size=None: no 224x224 resize, batches stay (N, 3, 40, T)
+    train_loader, classes = get_dataloader(train_dir, batch_size=BATCH_SIZE, shuffle=True, mean=mean, std=std, size=None)
+    val_loader, _ = get_dataloader(val_dir, batch_size=BATCH_SIZE, shuffle=False, mean=mean, std=std, size=None)
+    if train_loader is None or val_loader is None:
+        print("Failed to load datasets.", flush=True)
+        return
+
+    model = NativeMFCCNet(num_classes=len(classes))
+    input_shape = tuple(train_loader.dataset[0][0].shape)
+    print(f"NativeMFCCNet on {input_shape}: {count_flops(model, input_shape) / 1e9:.2f} GFLOPs per recording", flush=True)
+    model.to(device)
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = AdamW(model.parameters(), lr=LEARNING_RATE, weight_decay=WEIGHT_DECAY)
+    scheduler = ReduceLROnPlateau(optimizer, mode='max', factor=0.3, patience=3)
+
+    best_val_acc = 0.0
+
+    print("Starting training loop...", flush=True)
+    for epoch in range(EPOCHS):
+        model.train()
+        running_loss = 0.0
+
+        for i, (images, labels) in enumerate(train_loader):
+            images, labels = images.to(device), labels.to(device)
+
+            optimizer.zero_grad()
+            loss = criterion(model(images), labels)
+            loss.backward()
+            optimizer.step()
+
+            running_loss += loss.item()
+            if i % 5 == 0:
+                print(f"Epoch [{epoch+1}/{EPOCHS}] Batch {i}/{len(train_loader)} Loss: {loss.item():.4f}", flush=True)
+
+        epoch_loss = running_loss / len(train_loader)
+        val_acc, val_p, val_r, val_f1 = evaluate(model, val_loader, device)
+        scheduler.step(val_acc)
+
+        print(f"Epoch [{epoch+1}/{EPOCHS}] Summary - Loss: {epoch_loss:.4f} | Val Acc: {val_acc:.4f} | F1: {val_f1:.4f}", flush=True)
+
+        if val_acc > best_val_acc:
+            best_val_acc = val_acc
+            # train.py's format plus 'arch', which tells the registry to build
+            # NativeMFCCNet and to skip the 224x224 resize at inference
+            torch.save({
+                'model_state_dict': model.state_dict(),
+                'mean': mean,
+                'std': std,
+                'classes': classes,
+                'arch': 'native'
+            }, MODEL_SAVE_PATH)
+            print(f"--> Saved better model ({val_acc:.4f})", flush=True)
+
+    print(f"Training complete. Best Val Acc: {best_val_acc:.4f}", flush=True)
+
+if __name__ == "__main__":
+    train()
@@ -5,6 +5,90 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import scipy.fft
+import scipy.signal
+import torch
+from functools import lru_cache
+
+def compute_mfcc(y, sr=16000, n_mfcc=40, n_fft=1024, hop_length=320):
+    """
+    Computes 3-channel MFCC features (MFCC, Delta, Delta2) from a waveform.
+    Returns an array of shape (3, n_mfcc, T).
+    """
+    # Extract features according to user requirements
+    mfcc = librosa.feature.mfcc(
+        y=y,
+        sr=sr,
+        n_mfcc=n_mfcc,
+        n_fft=n_fft,
+        hop_length=hop_length
+    )
+
+    delta = librosa.feature.delta(mfcc)
+    delta2 = librosa.feature.delta(mfcc, order=2)
+
+    # Stack into 3 channels
+    return np.stack([mfcc, delta, delta2], axis=0) # (3, 40, T)
+
+@lru_cache(maxsize=None)
+def _mel_dct_basis(sr, n_fft, n_mfcc, n_mels=128):
+    # Same mel filterbank and orthonormal DCT-II librosa.feature.mfcc uses
+    mel_fb = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    dct = scipy.fft.dct(np.eye(n_mels), type=2, norm='ortho', axis=0)[:n_mfcc]
+    return torch.from_numpy(mel_fb).float(), torch.from_numpy(dct).float()
+
+@lru_cache(maxsize=None)
+def _delta_operator(n_frames, order, width=9):
+    # librosa.feature.delta is a Savitzky-Golay filter (mode='interp'), which is
+    # linear in its input: filtering the identity gives the (T, T) matrix D with
+    # delta(x) = x @ D, edge handling included
+    op = scipy.signal.savgol_filter(
+        np.eye(n_frames), window_length=width, polyorder=order, deriv=order, axis=0, mode='interp'
+    )
+    return torch.from_numpy(op.T.copy()).float()
+
+def compute_mfcc_batch(waveforms, sr=16000, n_mfcc=40, n_fft=1024, hop_length=320, device=None):
+    """
+    Batched torch version of compute_mfcc() for equal-length waveforms.
+    `waveforms` is a (B, L) tensor/array or a list of 1-D arrays (shorter ones are
+    zero-padded at the end, which changes their trailing frames, so standardize
+    lengths with load_audio() first). Returns a (B, 3, n_mfcc, T) float tensor that
+    matches compute_mfcc() to float32 precision (see test_mfcc_parity.py).
+    """
+    if isinstance(waveforms, (list, tuple)):
+        max_len = max(len(w) for w in waveforms)
+        batch = np.zeros((len(waveforms), max_len), dtype=np.float32)
+        for i, w in enumerate(waveforms):
+            batch[i, :len(w)] = w
+        waveforms = batch
+    y = torch.as_tensor(waveforms, dtype=torch.float32, device=device)
+    device = y.device
+
+    mel_fb, dct = _mel_dct_basis(sr, n_fft, n_mfcc)
+    mel_fb, dct = mel_fb.to(device), dct.to(device)
+
+    # Power spectrogram, centered frames with zero padding (librosa >= 0.10 defaults)
+    window = torch.hann_window(n_fft, periodic=True, device=device)
+    spec = torch.stft(
+        y, n_fft=n_fft, hop_length=hop_length, window=window,
+        center=True, pad_mode='constant', return_complex=True
+    )
+    power = spec.abs() ** 2 # (B, n_fft // 2 + 1, T)
+
+    # Log-mel (power_to_db with ref=1.0, amin=1e-10, top_db=80.0 per item)
+    mel = torch.matmul(mel_fb, power)
+    log_mel = 10.0 * torch.log10(torch.clamp(mel, min=1e-10))
+    floor = log_mel.amax(dim=(1, 2), keepdim=True) - 80.0
+    log_mel = torch.maximum(log_mel, floor)
+
+    mfcc = torch.matmul(dct, log_mel) # (B, n_mfcc, T)
+
+    n_frames = mfcc.shape[-1]
+    delta = torch.matmul(mfcc, _delta_operator(n_frames, 1).to(device))
+    delta2 = torch.matmul(mfcc, _delta_operator(n_frames, 2).to(device))
+
+    # Stack into 3 channels
+    return torch.stack([mfcc, delta, delta2], dim=1) # (B, 3, 40, T)
 
 def extract_mfcc(input_path, output_path, sr=16000, n_mfcc=40):
     """
@@ -12,27 +96,13 @@ def extract_mfcc(input_path, output_path, sr=16000, n_mfcc=40):
     """
     try:
         y, sr = librosa.load(input_path, sr=sr)
-        
-        # Extract features according to user requirements
-        mfcc = librosa.feature.mfcc(
-            y=y, 
-            sr=sr, 
-            n_mfcc=n_mfcc,
-            n_fft=1024,
-            hop_length=320
-        )
-        
-        delta = librosa.feature.delta(mfcc)
-        delta2 = librosa.feature.delta(mfcc, order=2)
-        
-        # Stack into 3 channels
-        mfcc_feat = np.stack([mfcc, delta, delta2], axis=0) # (3, 40, T)
-        
+        mfcc_feat = compute_mfcc(y, sr=sr, n_mfcc=n_mfcc)
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
+
         # Save as numpy array
         np.save(output_path, mfcc_feat)
-        
+
     except Exception as e:
         print(f"Error processing {input_path}: {e}")
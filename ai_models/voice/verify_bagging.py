@@ -1,104 +1,132 @@
+import argparse
+import os
+import time
+from itertools import combinations
+
+import numpy as np
 import torch
 import torch.nn.functional as F
-import numpy as np
-import os
-from bagging_inference import load_model, predict_ensemble
+from bagging_inference import ensembles
+from model_registry import registry
 from dataset import get_dataloader
 from sklearn.metrics import accuracy_score, f1_score
 
-def verify_bagging():
+EVAL_BATCH_SIZE = 64
+
+def collect_predictions(single, ensemble, loader):
+    """
+    One pass over `loader`: every batch is normalized and run through the
+    single model and (in one vectorized call) all ensemble members.
+    Returns labels (N,), single-model probs (N, C) and member probs (M, N, C).
+    """
+    labels, single_probs, member_probs = [], [], []
+    with torch.no_grad():
+        for images, batch_labels in loader:
+            norm_images = (images - single.mean) / (single.std + 1e-6)
+            logits = single.model(norm_images.to(single.device))
+            single_probs.append(F.softmax(logits, dim=1).cpu().numpy())
+            member_probs.append(ensemble.member_probs(images).numpy())
+            labels.append(batch_labels.numpy())
+    return np.concatenate(labels), np.concatenate(single_probs), np.concatenate(member_probs, axis=1)
+
+def diversity_stats(member_preds, labels):
+    """Pairwise disagreement and error overlap between ensemble members."""
+    num_models = len(member_preds)
+    pairwise = {
+        (i, j): float(np.mean(member_preds[i] != member_preds[j]))
+        for i, j in combinations(range(num_models), 2)
+    }
+    any_disagree = float(np.mean((member_preds != member_preds[0]).any(axis=0)))
+    wrong = member_preds != labels
+    # Fraction of the samples some member gets wrong that every member gets wrong
+    some_wrong = wrong.any(axis=0)
+    shared_errors = float(wrong.all(axis=0).sum() / some_wrong.sum()) if some_wrong.any() else 0.0
+    return pairwise, any_disagree, shared_errors
+
+def verify_bagging(split='val', batch_size=EVAL_BATCH_SIZE):
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model_files = ['swin_1.pth', 'swin_2.pth', 'swin_3.pth']
     single_model_file = 'best_model.pth'
-    
+
     # Check if files exist
-    all_exist = all(os.path.exists(f) for f in model_files + [single_model_file])
-    if not all_exist:
+    missing = [f for f in model_files + [single_model_file] if not os.path.exists(f)]
+    if missing:
         print("❌ Error: Some model files are missing. Please run training first.")
-        missing = [f for f in model_files + [single_model_file] if not os.path.exists(f)]
         print(f"Missing: {missing}")
         return
 
     # Load Data for testing
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'voice_mfcc', 'val')
-    test_loader, classes = get_dataloader(data_dir, batch_size=1, shuffle=False)
-    
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'datasets', 'voice_mfcc', split)
+    # Batches are resized in the collate stage but left un-normalized: the single
+    # model and the ensemble each apply their own checkpoint stats
+    test_loader, classes = get_dataloader(data_dir, batch_size=batch_size, shuffle=False)
+
     if test_loader is None:
-        print("❌ Error: Validation dataset not found.")
+        print(f"❌ Error: {split} dataset not found.")
         return
 
+    # Every model is loaded exactly once
+    single = registry.get(single_model_file, device)
+    ensemble = ensembles.get(model_files, device)
+    if list(ensemble.classes) != list(classes) or list(single.classes) != list(classes):
+        print(f"⚠ Class order differs from the dataset ({classes}); metrics use the dataset's label indices.")
+
+    start = time.time()
+    labels, single_probs, member_probs = collect_predictions(single, ensemble, test_loader)
+    elapsed = time.time() - start
+    print(f"Evaluated {len(labels)} {split} samples in {elapsed:.2f}s")
+
+    single_preds = single_probs.argmax(axis=1)
+    member_preds = member_probs.argmax(axis=2) # (M, N)
+    bagged_probs = member_probs.mean(axis=0)
+    bagged_preds = bagged_probs.argmax(axis=1)
+
     print("\n--- 1.1 Check diversity between models ---")
-    # Take one sample
-    sample_img, sample_label = next(iter(test_loader))
-    
-    individual_preds = []
-    for m_path in model_files:
-        model, mean, std, _ = load_model(m_path, device)
-        img = (sample_img - mean) / (std + 1e-6)
-        with torch.no_grad():
-            logits = model(img.to(device))
-            prob = F.softmax(logits, dim=1).cpu().numpy()
-            pred_idx = np.argmax(prob)
-            individual_preds.append((classes[pred_idx], np.max(prob)))
-            print(f"Model {m_path}: {classes[pred_idx]} ({np.max(prob):.4f})")
-            
-    ensemble_class, ensemble_conf = predict_ensemble(sample_img, model_files, device)
-    print(f"Ensemble: {ensemble_class} ({ensemble_conf:.4f})")
-    
-    # Diversity check: if they differ, it's good. 
-    unique_preds = set(p[0] for p in individual_preds)
-    if len(unique_preds) > 1:
+    for m_path, preds in zip(model_files, member_preds):
+        print(f"Model {m_path}: accuracy {accuracy_score(labels, preds):.2%}")
+    pairwise, any_disagree, shared_errors = diversity_stats(member_preds, labels)
+    for (i, j), rate in pairwise.items():
+        print(f"Disagreement {model_files[i]} vs {model_files[j]}: {rate:.2%}")
+    print(f"Samples where the members disagree: {any_disagree:.2%}")
+    print(f"Errors shared by every member: {shared_errors:.2%}")
+
+    # Diversity check: if they differ, it's good.
+    if any_disagree > 0:
         print("✔ Diversity detected! Bagging is doing something meaningful.")
     else:
-        print("⚠ All models predicted the same class for this sample. (This can happen, try more samples if needed)")
+        print("⚠ All models predicted the same class for every sample. Bagging adds nothing here.")
 
     print("\n--- 1.2 Compare metrics (MANDATORY) ---")
-    all_labels = []
-    single_preds = []
-    bagged_preds = []
-    
-    # Evaluation on a subset or full val set
-    limit = 50 # Limit for speed
-    print(f"Evaluating on {limit} samples...")
-    
-    for i, (img, label) in enumerate(test_loader):
-        if i >= limit: break
-        all_labels.append(label.item())
-        
-        # Single Model Prediction
-        m, mean, std, _ = load_model(single_model_file, device)
-        norm_img = (img - mean) / (std + 1e-6)
-        with torch.no_grad():
-            logits = m(norm_img.to(device))
-            single_preds.append(torch.argmax(logits).item())
-            
-        # Bagged Model Prediction
-        b_class, _ = predict_ensemble(img, model_files, device)
-        bagged_preds.append(classes.index(b_class))
-        
-    single_acc = accuracy_score(all_labels, single_preds)
-    single_f1 = f1_score(all_labels, single_preds, average='weighted', zero_division=0)
-    
-    bagged_acc = accuracy_score(all_labels, bagged_preds)
-    bagged_f1 = f1_score(all_labels, bagged_preds, average='weighted', zero_division=0)
-    
+    single_acc = accuracy_score(labels, single_preds)
+    single_f1 = f1_score(labels, single_preds, average='weighted', zero_division=0)
+
+    bagged_acc = accuracy_score(labels, bagged_preds)
+    bagged_f1 = f1_score(labels, bagged_preds, average='weighted', zero_division=0)
+
     print(f"{'Model':<20} | {'Accuracy':<10} | {'F1':<10}")
     print("-" * 45)
     print(f"{'Single Swin':<20} | {single_acc:.2%} | {single_f1:.2f}")
-    print(f"{'Bagged Swin (3x)':<20} | {bagged_acc:.2%} | {bagged_f1:.2f}")
+    print(f"{f'Bagged Swin ({len(ensemble)}x)':<20} | {bagged_acc:.2%} | {bagged_f1:.2f}")
 
     print("\n--- 1.3 Stability test ---")
-    print("Running inference 3 times on the same audio...")
-    stability_preds = []
+    print("Running inference 3 times on the same batch...")
+    sample_img, _ = next(iter(test_loader))
+    reference = bagged_preds[:len(sample_img)]
+    stable = True
     for i in range(3):
-        res_class, _ = predict_ensemble(sample_img, model_files, device)
-        stability_preds.append(res_class)
-        print(f"Run {i+1}: {res_class}")
-        
-    if len(set(stability_preds)) == 1:
+        run_preds = ensemble.predict_proba(sample_img).argmax(dim=1).numpy()
+        flips = int((run_preds != reference).sum())
+        stable = stable and flips == 0
+        print(f"Run {i+1}: {flips} prediction(s) differ from the first pass")
+
+    if stable:
         print("✔ Prediction is stable across runs.")
     else:
         print("❌ ERROR: Output flips randomly! Check for non-deterministic behavior.")
 
 if __name__ == "__main__":
-    verify_bagging()
+    parser = argparse.ArgumentParser(description="Single model vs. bagged ensemble on a full voice split")
+    parser.add_argument('--split', default='val', choices=['val', 'test'])
+    parser.add_argument('--batch-size', type=int, default=EVAL_BATCH_SIZE)
+    args = parser.parse_args()
+    verify_bagging(args.split, args.batch_size)
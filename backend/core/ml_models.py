@@ -0,0 +1,83 @@
+"""
+Lightweight facade over the voice and MRI inference modules.
+
+Importing this module is cheap: torch, timm, librosa and the models are only
+imported and loaded on the first prediction, or ahead of time by warm_up()
+(run from the apps' AppConfig.ready when INFERENCE_WARM_UP=1, or with
+`python manage.py warm_up_models`). manage.py commands, migrations and tests
+that never predict never pay for them.
+"""
+import os
+import sys
+import threading
+
+from django.conf import settings
+
+# Load the models while the process starts (set this for the web workers)
+WARM_UP_ON_STARTUP = os.environ.get("INFERENCE_WARM_UP", "0") == "1"
+
+_lock = threading.RLock()
+_modules = {}
+
+def _voice():
+    with _lock:
+        if 'voice' not in _modules:
+            sys.path.append(os.path.join(settings.BASE_DIR, '..', 'ai_models', 'voice'))
+            try:
+                import inference
+            except ImportError as e:
+                print(f"Warning: could not import predict from inference.py: {e}")
+                inference = None
+            _modules['voice'] = inference
+        return _modules['voice']
+
+def _mri():
+    with _lock:
+        if 'mri' not in _modules:
+            project_root = os.path.dirname(os.path.abspath(settings.BASE_DIR))
+            if project_root not in sys.path:
+                sys.path.append(project_root)
+            from ai_models.mri import bagging_inference
+            _modules['mri'] = bagging_inference
+        return _modules['mri']
+
+def predict_voice_batched(audio_source, raise_errors=False):
+    """
+    Dementia probability of an audio file (see ai_models/voice/inference.predict_batched).
+    raise_errors=True raises instead of returning a fallback score.
+    """
+    inference = _voice()
+    if inference is None:
+        if raise_errors:
+            raise RuntimeError("Voice inference module is not available.")
+        return 0.0
+    return inference.predict_batched(audio_source, raise_errors=raise_errors)
+
+def predict_mri_batched(image_path):
+    """(label, confidence) of an MRI image from the bagged ensemble."""
+    return _mri().predict_mri_ensemble_batched(image_path)
+
+def mri_ensemble_members():
+    """Checkpoint paths of the loaded MRI ensemble members."""
+    return _mri().ensemble.active_members()
+
+def warm_up(modality):
+    """
+    Imports the inference module of `modality` ('voice' or 'mri') and loads its
+    models. Returns what was loaded; errors are reported, not raised.
+    """
+    try:
+        if modality == 'voice':
+            inference = _voice()
+            return inference.warm_up() if inference is not None else []
+        if modality == 'mri':
+            return _mri().warm_up()
+        raise ValueError(f"Unknown modality: {modality}")
+    except Exception as e:
+        print(f"Error warming up {modality} model: {e}")
+        return []
+
+def warm_up_on_startup(modality):
+    """Called from AppConfig.ready: loads the models only when INFERENCE_WARM_UP=1."""
+    if WARM_UP_ON_STARTUP:
+        warm_up(modality)
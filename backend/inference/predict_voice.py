@@ -1,9 +1,14 @@
-import torch
-import torch.nn as nn
-from torchvision import transforms
+import numpy as np
 from PIL import Image
-import timm
 import os
+import sys
+import threading
+
+# Project root, for the shared ai_models helpers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# torch and timm are imported only on the eager path (see load_model), so an
+# INFERENCE_BACKEND=onnx deployment serves with onnxruntime alone
+from ai_models.onnx_backend import OnnxModel, load_onnx, use_onnx
 
 # ---------- CONFIG ----------
 # Adjust path to be relative or absolute as needed. 
@@ -12,10 +17,34 @@ import os
 # Using relative path assuming 'backend' is the root for django execution context or adjusting accordingly.
 MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "best_model.pth")
 IMG_SIZE = 224
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+def get_device():
+    import torch
+
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 # ---------- MODEL ----------
 def load_model():
+    if use_onnx() and os.path.exists(MODEL_PATH):
+        # INFERENCE_BACKEND=onnx: run the exported graph (falls back to torch without one)
+        onnx_model, _ = load_onnx(MODEL_PATH)
+        if onnx_model is not None:
+            return onnx_model
+
+    import torch
+    import timm
+    from ai_models.shared_weights import build_shared, use_shared_weights
+
+    device = get_device()
+    if use_shared_weights(device) and os.path.exists(MODEL_PATH):
+        # SHARED_WEIGHTS=1: weights are views of a memory map shared by all workers
+        shared_model, _ = build_shared(
+            lambda meta: timm.create_model("swin_tiny_patch4_window7_224", pretrained=False, num_classes=2),
+            MODEL_PATH
+        )
+        if shared_model is not None:
+            return shared_model
+
     # Defining model structure matching training
     model = timm.create_model(
         "swin_tiny_patch4_window7_224",
@@ -24,31 +53,51 @@ def load_model():
     )
     
     if os.path.exists(MODEL_PATH):
-        model.load_state_dict(torch.load(MODEL_PATH, map_location=DEVICE))
+        model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
     else:
         print(f"Warning: Model file not found at {MODEL_PATH}")
         
-    model.to(DEVICE)
+    model.to(device)
     model.eval()
     return model
 
-# Load model globally to avoid reloading on every request (efficiency)
-# Note: In production, consider where this is loaded to avoid memory issues if multiple workers.
-try:
-    model = load_model()
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+# Loaded once per process on first use (or by warm_up()), not at import time,
+# so importing this module stays cheap
+model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global model
+    with _model_lock:
+        if model is None:
+            try:
+                model = load_model()
+            except Exception as e:
+                print(f"Error loading model: {e}")
+        return model
+
+def warm_up():
+    return get_model() is not None
 
 # ---------- TRANSFORM ----------
-transform = transforms.Compose([
-    transforms.Resize((IMG_SIZE, IMG_SIZE)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.5], std=[0.5]) # Matching user's requested logic
-])
+def transform(image):
+    """
+    Resize to IMG_SIZE, scale to [0, 1] and normalize with mean=std=0.5
+    (torchvision's Resize/ToTensor/Normalize on a PIL image), as a (3, H, W)
+    float32 array that both backends accept.
+    """
+    image = image.resize((IMG_SIZE, IMG_SIZE), Image.BILINEAR)
+    array = np.asarray(image, dtype=np.float32) / 255.0
+    array = (array - 0.5) / 0.5 # Matching user's requested logic
+    return array.transpose(2, 0, 1)
+
+def softmax(logits):
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
 
 # ---------- PREDICT ----------
 def predict_mfcc(mfcc_image_path):
+    model = get_model()
     if model is None:
         raise RuntimeError("Model not loaded")
 
@@ -57,17 +106,19 @@ def predict_mfcc(mfcc_image_path):
 
     try:
         image = Image.open(mfcc_image_path).convert("RGB")
-        image = transform(image).unsqueeze(0).to(DEVICE)
-
-        with torch.no_grad():
-            outputs = model(image)
-            # Assuming outputs are raw logits. 
-            # If model output was already softmaxed in training modification it would be different, 
-            # but standard Swin from timm returns logits.
-            probs = torch.softmax(outputs, dim=1)
-            
-            # Assuming class 1 is dementia based on "Dementia -> label 1" assumption in Step 7A
-            dementia_prob = probs[0][1].item()
+        batch = transform(image)[None]
+
+        if isinstance(model, OnnxModel):
+            logits = model(batch)
+        else:
+            import torch
+
+            with torch.no_grad():
+                logits = model(torch.from_numpy(batch).to(get_device())).cpu().numpy()
+
+        # Assuming outputs are raw logits (standard Swin from timm) and that
+        # class 1 is dementia based on "Dementia -> label 1" assumption in Step 7A
+        dementia_prob = float(softmax(logits)[0][1])
 
         return dementia_prob
     except Exception as e:
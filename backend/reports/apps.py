@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ReportsConfig(AppConfig):
     name = 'reports'
+
+    def ready(self):
+        # Web workers set INFERENCE_WARM_UP=1 to load the MRI ensemble at startup;
+        # other processes (manage.py commands, migrations, tests) skip it
+        from core.ml_models import warm_up_on_startup
+        warm_up_on_startup('mri')
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ml_models import warm_up
+
+
+class Command(BaseCommand):
+    help = "Imports the inference stack and loads the voice and MRI models, reporting what was loaded."
+
+    def add_arguments(self, parser):
+        parser.add_argument('modalities', nargs='*', help="voice and/or mri (default: both)")
+
+    def handle(self, *args, **options):
+        modalities = options['modalities'] or ['voice', 'mri']
+        unknown = set(modalities) - {'voice', 'mri'}
+        if unknown:
+            raise CommandError(f"Unknown modality: {', '.join(sorted(unknown))}")
+
+        failed = []
+        for modality in modalities:
+            start = time.perf_counter()
+            loaded = warm_up(modality)
+            elapsed = time.perf_counter() - start
+            if loaded:
+                self.stdout.write(self.style.SUCCESS(f"{modality}: {len(loaded)} model(s) ready in {elapsed:.1f}s"))
+            else:
+                self.stdout.write(self.style.WARNING(f"{modality}: no models loaded"))
+                failed.append(modality)
+        if failed:
+            raise CommandError(f"Warm-up loaded nothing for: {', '.join(failed)}")
@@ -1,5 +1,4 @@
 import os
-import sys
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -9,13 +8,9 @@ from voice.models import VoiceTest
 from cognitive.models import CognitiveResult
 from .models import AssessmentReport
 from accounts.models import User
-
-# Add project root to sys.path for AI models
-project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-if project_root not in sys.path:
-    sys.path.append(project_root)
-
-from ai_models.mri.bagging_inference import predict_mri_ensemble
+# The MRI ensemble (torch, timm, the checkpoints) is imported on first use or by
+# the warm-up in ReportsConfig.ready, not when this module is
+from core.ml_models import mri_ensemble_members, predict_mri_batched
 
 class FusionReportView(APIView):
     def post(self, request):
@@ -130,8 +125,8 @@ class MRIUploadView(APIView):
             for chunk in file_obj.chunks():
                 destination.write(chunk)
 
-        # Run AI Inference (BAGGING ENSEMBLE)
-        label, prob = predict_mri_ensemble(temp_path)
+        # Run AI Inference (BAGGING ENSEMBLE), batched with concurrent uploads
+        label, prob = predict_mri_batched(temp_path)
         
         # Cleanup
         if os.path.exists(temp_path):
@@ -152,5 +147,6 @@ class MRIUploadView(APIView):
             "patient_id": patient_id,
             "mri_result": label,
             "confidence": prob,
+            "ensemble_members": [os.path.basename(p) for p in mri_ensemble_members()],
             "recommendation": "Consult neurologist for next steps." if label != "NonDemented" else "Routine checkups recommended."
         }, status=status.HTTP_200_OK)
@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class VoiceConfig(AppConfig):
     name = 'voice'
+
+    def ready(self):
+        # Web workers set INFERENCE_WARM_UP=1 to load the voice model at startup;
+        # other processes (manage.py commands, migrations, tests) skip it
+        from core.ml_models import warm_up_on_startup
+        warm_up_on_startup('voice')
+
+        # VOICE_JOB_AUTOSTART=1: run jobs left queued (or orphaned) by a restart
+        from .jobs import START_ON_STARTUP
+        if START_ON_STARTUP:
+            from .views import job_queue
+            job_queue.start()
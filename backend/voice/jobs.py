@@ -0,0 +1,149 @@
+import os
+import threading
+from datetime import timedelta
+
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import VoiceAnalysisJob
+
+NUM_WORKERS = int(os.environ.get("VOICE_JOB_WORKERS", 2))
+POLL_INTERVAL = float(os.environ.get("VOICE_JOB_POLL_SECONDS", 2))
+# Running jobs touch their heartbeat this often; a RUNNING job whose heartbeat is
+# older than the timeout was orphaned by a crashed worker and is re-queued
+HEARTBEAT_INTERVAL = float(os.environ.get("VOICE_JOB_HEARTBEAT_SECONDS", 30))
+RUNNING_TIMEOUT = float(os.environ.get("VOICE_JOB_TIMEOUT_SECONDS", 120))
+# Start the workers from VoiceConfig.ready (set this for the web workers), so
+# jobs still queued after a restart run without waiting for a new upload
+START_ON_STARTUP = os.environ.get("VOICE_JOB_AUTOSTART", "0") == "1"
+
+
+class VoiceJobQueue:
+    """
+    DB-backed queue for asynchronous voice analysis (no external broker).
+
+    enqueue() stores a PENDING VoiceAnalysisJob and wakes the local worker
+    threads. A worker claims a job by flipping it from PENDING to RUNNING with a
+    conditional UPDATE, so several workers (or processes sharing the database)
+    never run the same job twice. Workers also poll every `poll_interval`
+    seconds, which picks up jobs enqueued by other processes or left over from
+    a restart. While a job runs, its worker touches `heartbeat_at` every
+    `heartbeat_interval` seconds; a RUNNING job without a heartbeat for
+    `running_timeout` seconds (its worker crashed) is put back to PENDING
+    before the next claim. A run only records its outcome while it still owns
+    the job (same `started_at`), so a superseded run cannot overwrite a newer one.
+
+    `process_fn` receives the job's VoiceTest and does the actual inference.
+    """
+    def __init__(self, process_fn, num_workers=NUM_WORKERS, poll_interval=POLL_INTERVAL,
+                 running_timeout=RUNNING_TIMEOUT, heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.process_fn = process_fn
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.running_timeout = running_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self._wake = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.num_workers):
+                thread = threading.Thread(target=self._run, name=f"voice-job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, voice_test):
+        job = VoiceAnalysisJob.objects.create(voice_test=voice_test)
+        self.start()
+        self._wake.set()
+        return job
+
+    def requeue_stale(self):
+        """Puts RUNNING jobs without a heartbeat for `running_timeout` back to PENDING. Returns how many."""
+        cutoff = timezone.now() - timedelta(seconds=self.running_timeout)
+        return VoiceAnalysisJob.objects.filter(status='RUNNING', heartbeat_at__lt=cutoff).update(
+            status='PENDING', started_at=None, heartbeat_at=None
+        )
+
+    def claim_next(self):
+        """Atomically moves the oldest PENDING job to RUNNING. Returns None when idle."""
+        requeued = self.requeue_stale()
+        if requeued:
+            print(f"Re-queued {requeued} stale voice job(s)")
+        while True:
+            job = VoiceAnalysisJob.objects.filter(status='PENDING').order_by('created_at', 'id').first()
+            if job is None:
+                return None
+
+            now = timezone.now()
+            claimed = VoiceAnalysisJob.objects.filter(id=job.id, status='PENDING').update(
+                status='RUNNING', started_at=now, heartbeat_at=now
+            )
+            if claimed:
+                job.status = 'RUNNING'
+                job.started_at = now
+                job.heartbeat_at = now
+                return job
+            # Another worker got there first; try the next one
+
+    def _owned(self, job):
+        """The job row as long as this run still owns it (not re-queued and claimed again)."""
+        return VoiceAnalysisJob.objects.filter(id=job.id, status='RUNNING', started_at=job.started_at)
+
+    def _heartbeat(self, job, stop):
+        touched = False
+        try:
+            while not stop.wait(self.heartbeat_interval):
+                self._owned(job).update(heartbeat_at=timezone.now())
+                touched = True
+        except Exception as e:
+            print(f"Voice job {job.id} heartbeat failed: {e}")
+        finally:
+            if touched:
+                connection.close() # This thread's own DB connection
+
+    def run_job(self, job):
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, stop), name=f"voice-job-heartbeat-{job.id}", daemon=True)
+        heartbeat.start()
+        try:
+            self.process_fn(job.voice_test)
+            job.status = 'DONE'
+        except Exception as e:
+            print(f"Voice job {job.id} failed: {e}")
+            job.status = 'FAILED'
+            job.error = str(e)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        job.finished_at = timezone.now()
+        recorded = self._owned(job).update(status=job.status, error=job.error, finished_at=job.finished_at)
+        if not recorded:
+            print(f"Voice job {job.id} was re-queued while running; discarding this run's outcome")
+        return bool(recorded)
+
+    def _run(self):
+        while True:
+            close_old_connections()
+            try:
+                job = self.claim_next()
+                if job is not None:
+                    self.run_job(job)
+            except Exception as e:
+                # e.g. a locked database: the job stays RUNNING and is re-queued once its heartbeat is stale
+                print(f"Voice job queue error: {e}")
+                job = None
+
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+def queue_position(job):
+    """Number of jobs that will be picked up before this one (0 once it is running)."""
+    if job.status != 'PENDING':
+        return 0
+    return VoiceAnalysisJob.objects.filter(status='PENDING', id__lt=job.id).count()
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voice', '0002_voiceanalysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voiceanalysisjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,3 +1,145 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from patients.models import Patient
+from .jobs import VoiceJobQueue, queue_position
+from .models import VoiceAnalysisJob, VoiceTest
+from .views import job_queue
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class VoiceJobQueueTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        user = User.objects.create_user(email="queue@example.com", password="TestPass123!")
+        self.patient = Patient.objects.create(
+            user=user, name="Queue Patient", age=70, gender='M', language='en', education='HS'
+        )
+        self.processed = []
+        self.queue = VoiceJobQueue(self.processed.append, num_workers=0)
+
+    def make_voice_test(self):
+        return VoiceTest.objects.create(
+            patient=self.patient, audio_file=SimpleUploadedFile("sample.wav", b"RIFF")
+        )
+
+    def test_enqueue_creates_pending_job(self):
+        voice_test = self.make_voice_test()
+        job = self.queue.enqueue(voice_test)
+        self.assertEqual(job.status, 'PENDING')
+        self.assertEqual(job.voice_test, voice_test)
+
+    def test_claim_next_takes_oldest_first(self):
+        first = self.queue.enqueue(self.make_voice_test())
+        second = self.queue.enqueue(self.make_voice_test())
+
+        self.assertEqual(self.queue.claim_next().id, first.id)
+        self.assertEqual(self.queue.claim_next().id, second.id)
+        self.assertIsNone(self.queue.claim_next())
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'RUNNING')
+        self.assertIsNotNone(first.started_at)
+
+    def test_queue_position(self):
+        jobs = [self.queue.enqueue(self.make_voice_test()) for _ in range(3)]
+        self.assertEqual([queue_position(job) for job in jobs], [0, 1, 2])
+
+        self.queue.claim_next()
+        for job in jobs:
+            job.refresh_from_db()
+        self.assertEqual([queue_position(job) for job in jobs], [0, 0, 1])
+
+    def test_stale_running_job_is_requeued(self):
+        job = self.queue.enqueue(self.make_voice_test())
+        stale = timezone.now() - timedelta(seconds=self.queue.running_timeout + 1)
+        VoiceAnalysisJob.objects.filter(id=job.id).update(status='RUNNING', started_at=stale, heartbeat_at=stale)
+        self.assertEqual(self.queue.claim_next().id, job.id)
+
+    def test_long_job_with_fresh_heartbeat_is_not_requeued(self):
+        job = self.queue.enqueue(self.make_voice_test())
+        long_ago = timezone.now() - timedelta(seconds=self.queue.running_timeout * 10)
+        VoiceAnalysisJob.objects.filter(id=job.id).update(
+            status='RUNNING', started_at=long_ago, heartbeat_at=timezone.now()
+        )
+        self.assertIsNone(self.queue.claim_next())
+
+    def test_superseded_run_does_not_overwrite_outcome(self):
+        job = self.queue.enqueue(self.make_voice_test())
+        first_run = self.queue.claim_next()
+        # The job is re-queued and claimed again by another worker meanwhile
+        VoiceAnalysisJob.objects.filter(id=job.id).update(
+            status='RUNNING', started_at=first_run.started_at + timedelta(seconds=1)
+        )
+        self.assertFalse(self.queue.run_job(first_run))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'RUNNING')
+        self.assertIsNone(job.finished_at)
+
+    def test_recent_running_job_is_not_requeued(self):
+        job = self.queue.enqueue(self.make_voice_test())
+        self.queue.claim_next()
+        self.assertIsNone(self.queue.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'RUNNING')
+
+    def test_run_job_marks_done_or_failed(self):
+        job = self.queue.enqueue(self.make_voice_test())
+        self.queue.run_job(self.queue.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'DONE')
+        self.assertEqual(self.processed, [job.voice_test])
+
+        def fail(voice_test):
+            raise RuntimeError("model missing")
+
+        failing = VoiceJobQueue(fail, num_workers=0)
+        job = failing.enqueue(self.make_voice_test())
+        failing.run_job(failing.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(job.error, "model missing")
+
+    @mock.patch.object(job_queue, 'start')
+    def test_async_upload_returns_202_and_status(self, start):
+        client = APIClient()
+        response = client.post('/api/voice/upload/?async=true', {
+            'patient': self.patient.id,
+            'audio_file': SimpleUploadedFile("sample.wav", b"RIFF"),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'PENDING')
+        start.assert_called()
+
+        job_id = response.data['job_id']
+        pending = client.get(response.data['status_url'])
+        self.assertEqual(pending.status_code, status.HTTP_200_OK)
+        self.assertEqual(pending.data['status'], 'PENDING')
+        self.assertEqual(pending.data['queue_position'], 0)
+
+        job = VoiceAnalysisJob.objects.get(id=job_id)
+        VoiceTest.objects.filter(id=job.voice_test_id).update(dementia_score=0.82)
+        job.status = 'DONE'
+        job.save()
+        done = client.get(f'/api/voice/jobs/{job_id}/')
+        self.assertEqual(done.data['status'], 'DONE')
+        self.assertEqual(done.data['probability'], 0.82)
+        self.assertEqual(done.data['risk_level'], 'HIGH')
+
+    def test_unknown_job_is_404(self):
+        response = APIClient().get('/api/voice/jobs/9999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import VoiceUploadView, PatientAudioStorageView
+from .views import VoiceUploadView, PatientAudioStorageView, VoiceJobStatusView
 
 urlpatterns = [
     path('upload/', VoiceUploadView.as_view()), # Phase 1: Inference
     path('store/', PatientAudioStorageView.as_view()), # Phase 2: Storage
+    path('jobs/<int:job_id>/', VoiceJobStatusView.as_view()), # Async inference status
 ]
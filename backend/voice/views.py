@@ -1,18 +1,55 @@
-import sys
 import os
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from .models import VoiceTest
+from rest_framework.views import APIView
+from django.shortcuts import get_object_or_404
+from .jobs import VoiceJobQueue, queue_position
+from .models import VoiceTest, VoiceAnalysisJob
 from .serializers import VoiceTestSerializer
 from django.conf import settings
+# The inference stack (torch, librosa, the model) is imported on first use or by
+# the warm-up in VoiceConfig.ready, not when this module is
+from core.ml_models import predict_voice_batched
 
-# Add ai_models to sys.path
-sys.path.append(os.path.join(settings.BASE_DIR, '..', 'ai_models', 'voice'))
-try:
-    from inference import predict
-except ImportError:
-    print("Warning: could not import predict from inference.py")
-    def predict(path): return 0.0
+def risk_level_for(score):
+    return "HIGH" if score > 0.7 else ("MEDIUM" if score > 0.4 else "LOW")
+
+def score_voice_test(voice_test, raise_errors=False):
+    """
+    Runs inference on a stored VoiceTest and writes the score back to it.
+    With raise_errors=True (async jobs) inference errors propagate, so the job
+    is marked FAILED instead of reporting the demo fallback score.
+    """
+    # Run inference straight from the uploaded file (no temporary copies);
+    # the forward pass is batched with any concurrent uploads
+    try:
+        with voice_test.audio_file.open('rb') as audio_file:
+            dementia_score = predict_voice_batched(audio_file, raise_errors=raise_errors)
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Inference error: {e}")
+        dementia_score = 0.5 # Fallback for demo
+
+    # Define MFCC directory
+    mfcc_dir = os.path.join(settings.MEDIA_ROOT, 'mfcc')
+    os.makedirs(mfcc_dir, exist_ok=True)
+
+    # Save the results to the model
+    voice_test.dementia_score = dementia_score
+    voice_test.mfcc_image = f'mfcc/{voice_test.id}.png'
+    voice_test.save()
+    return dementia_score
+
+def score_voice_job(voice_test):
+    return score_voice_test(voice_test, raise_errors=True)
+
+# Background inference for ?async=true uploads
+job_queue = VoiceJobQueue(score_voice_job)
+
+def _wants_async(request):
+    value = request.query_params.get('async', request.data.get('async', ''))
+    return str(value).lower() in ('1', 'true', 'yes')
 
 class VoiceUploadView(generics.CreateAPIView):
     serializer_class = VoiceTestSerializer
@@ -38,41 +75,62 @@ class VoiceUploadView(generics.CreateAPIView):
         # Save with the identified patient
         voice_test = serializer.save(patient=patient)
 
-        # Get absolute path of the uploaded file
-        audio_path = voice_test.audio_file.path
+        # Async mode: hand the stored upload to the job workers and return right away
+        if _wants_async(self.request):
+            self.job = job_queue.enqueue(voice_test)
+            return
 
-        # Run inference
-        try:
-            dementia_score = predict(audio_path)
-        except Exception as e:
-            print(f"Inference error: {e}")
-            dementia_score = 0.5 # Fallback for demo
-
-        # Define MFCC directory
-        mfcc_dir = os.path.join(settings.MEDIA_ROOT, 'mfcc')
-        os.makedirs(mfcc_dir, exist_ok=True)
-        
-        # Save the results to the model
-        voice_test.dementia_score = dementia_score
-        voice_test.mfcc_image = f'mfcc/{voice_test.id}.png'
-        voice_test.save()
+        score_voice_test(voice_test)
 
     def create(self, request, *args, **kwargs):
+        self.job = None
         response = super().create(request, *args, **kwargs)
+
+        if self.job is not None:
+            return Response({
+                "id": response.data['id'],
+                "job_id": self.job.id,
+                "status": self.job.status,
+                "status_url": f"/api/voice/jobs/{self.job.id}/",
+                "message": "Analysis queued."
+            }, status=status.HTTP_202_ACCEPTED)
+
         # Fetch the object to get the calculated score
         voice_test = VoiceTest.objects.get(id=response.data['id'])
         score = voice_test.dementia_score or 0.0
         
-        # Risk level logic
-        risk_level = "HIGH" if score > 0.7 else ("MEDIUM" if score > 0.4 else "LOW")
-        
         return Response({
             "id": voice_test.id,
             "probability": round(score, 3),
-            "risk_level": risk_level,
+            "risk_level": risk_level_for(score),
             "message": "Analysis complete."
         })
 
+class VoiceJobStatusView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(VoiceAnalysisJob.objects.select_related('voice_test'), id=job_id)
+
+        data = {
+            "job_id": job.id,
+            "id": job.voice_test_id,
+            "status": job.status,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+        if job.status == 'PENDING':
+            data["queue_position"] = queue_position(job)
+        elif job.status == 'DONE':
+            score = job.voice_test.dementia_score or 0.0
+            data["probability"] = round(score, 3)
+            data["risk_level"] = risk_level_for(score)
+            data["message"] = "Analysis complete."
+        elif job.status == 'FAILED':
+            data["error"] = job.error
+        return Response(data)
+
 class PatientAudioStorageView(generics.CreateAPIView):
     serializer_class = VoiceTestSerializer
     permission_classes = [permissions.AllowAny]
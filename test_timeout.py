@@ -1,21 +1,27 @@
-import timm
-import torch
 import threading
 import time
 
-def create_model():
-    print("Starting model creation...")
+from ai_models.model_factory import PretrainedWeightsMissing, create_swin
+
+def create_model(pretrained):
+    print(f"Starting model creation (pretrained={pretrained})...")
+    start = time.time()
     try:
-        model = timm.create_model('swin_tiny_patch4_window7_224', pretrained=True)
-        print("Success! Model created.")
+        create_swin(num_classes=2, pretrained=pretrained)
+        print(f"Success! Model created in {time.time() - start:.1f}s.")
+    except PretrainedWeightsMissing as e:
+        # Expected without a local weight cache: must fail fast, not hang
+        print(f"Failed fast in {time.time() - start:.1f}s: {e}")
     except Exception as e:
         print(f"Error: {e}")
 
-thread = threading.Thread(target=create_model)
-thread.start()
-thread.join(timeout=30)
+for pretrained in (False, True):
+    thread = threading.Thread(target=create_model, args=(pretrained,))
+    thread.start()
+    thread.join(timeout=30)
 
-if thread.is_alive():
-    print("TIMEOUT: Model creation hung for 30 seconds.")
+    if thread.is_alive():
+        print("TIMEOUT: Model creation hung for 30 seconds.")
+        break
 else:
     print("Done.")